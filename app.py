@@ -1,8 +1,9 @@
 import streamlit as st
-from google.oauth2 import service_account
-from google.cloud import storage
 
 from src.gcs import get_image_from_gcs
+from src.prefetch import start_prefetch
+from src.storage import get_storage
+from src.warm import start_warmer
 
 # --- App Configuration ---
 st.set_page_config(
@@ -15,33 +16,39 @@ st.set_page_config(
 BUCKET_NAME = 'wb-ldt'
 
 
-# --- Initialization ---
-@st.cache_resource
-def init_gcs_client():
-    """Initialize Google Cloud Storage client using credentials from Streamlit secrets."""
-    creds_dict = {
-        "type": "service_account",
-        "project_id": st.secrets["gcs"]["project_id"],
-        "private_key_id": st.secrets["gcs"]["private_key_id"],
-        "private_key": st.secrets["gcs"]["private_key"], 
-        "client_email": st.secrets["gcs"]["client_email"],
-        "client_id": st.secrets["gcs"]["client_id"],
-        "auth_uri": st.secrets["gcs"]["auth_uri"],
-        "token_uri": st.secrets["gcs"]["token_uri"],
-        "auth_provider_x509_cert_url": st.secrets["gcs"]["auth_provider_x509_cert_url"],
-        "client_x509_cert_url": st.secrets["gcs"]["client_x509_cert_url"],
-        "universe_domain": "googleapis.com"
-    }
-    credentials = service_account.Credentials.from_service_account_info(creds_dict)
-    return storage.Client(credentials=credentials)
+# Download all dashboard layers in the background while the logo and the first page load
+prefetcher = start_prefetch()
+# Off unless DASHBOARD_WARM=1: render every page for every municipality ahead of demand
+warmer = start_warmer()
+try:
+    pimpam_logo = get_image_from_gcs(get_storage(), BUCKET_NAME, "decision_engine/inputs/wbg-pimpam.png")
+except FileNotFoundError:
+    # Not in local mirrors or synthetic datasets: run without the logo
+    pimpam_logo = None
 
-storage_client = init_gcs_client()
-pimpam_logo = get_image_from_gcs(storage_client, BUCKET_NAME, "decision_engine/inputs/wbg-pimpam.png")
+
+def prefetch_progress():
+    """
+    Show how many layers and warm-up tasks are still loading; refreshes on its own without
+    rerunning the page. Once both are done it reruns the app, which no longer registers it.
+    """
+    if prefetcher.done() and warmer.done():
+        st.rerun()
+    finished, total = prefetcher.progress()
+    if finished < total:
+        st.progress(finished / total, text=f"Loading data layers... {finished}/{total}")
+    finished, total = warmer.progress()
+    if finished < total:
+        st.progress(finished / total, text=f"Preparing municipalities... {finished}/{total}")
 
 
 with st.sidebar:
-    st.image(pimpam_logo, use_container_width=True)
+    if pimpam_logo is not None:
+        st.image(pimpam_logo, use_container_width=True)
     # st.image("images/GPBP Logo.png", use_container_width=True)
+    # Refreshed every second only while there is work left, so idle sessions get no updates
+    if not prefetcher.done() or not warmer.done():
+        st.fragment(prefetch_progress, run_every=1)()
 
 pages = {
     "About": [
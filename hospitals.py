@@ -1,54 +1,29 @@
-import pandas as pd
-import geopandas as gpd
-import folium
 import streamlit as st
-from folium import FeatureGroup, CircleMarker, PolyLine
-from streamlit_folium import st_folium
 
-from src.utils import normalize, find_municipality_match, load_poly, load_hospitals, extract_name
+from src.aggregates import load_aggregates
+from src.selector import municipality_selector
+from src.timing import start_run, mark, finish_run
+from src.clustering import cluster_map_section
+from src.national_map import national_map_section
+from src.page_maps import draw_map
+
+start_run("hospitals")
 
 st.header("Healthcare Facilities")
 st.markdown("")
 st.markdown("")
 
-hospitals = load_hospitals()
-poly = load_poly()
-hospitals = hospitals.to_crs(poly.crs)
-hospitals = hospitals.sjoin(poly, how='inner', predicate='intersects').drop(columns=['index_right'])
-
 # --- Global Sidebar: Municipality Selector ---
-if 'highlight_municipality' not in st.session_state:
-    st.session_state.highlight_municipality = "Veliko Gradište"
-if 'valid_municipality' not in st.session_state:
-    st.session_state.valid_municipality = "Veliko Gradište"
-with st.sidebar:
-    st.markdown("### 🔎 Municipality selector")
-    st.text_input(
-        "Highlight a municipality (you can type partial or accent-free name, e.g., sabac or Nis):",
-        placeholder="e.g., sabac or Nis",
-        key="highlight_municipality"
-    )
-    name_lookup = {normalize(s): s for s in poly["Municipality"].unique()}
-    if st.session_state.highlight_municipality.strip():
-        matches = find_municipality_match(st.session_state.highlight_municipality, name_lookup)
+municipality = municipality_selector()
+mark("selector")
 
-        if len(matches) == 1:
-            st.session_state.valid_municipality = matches[0]
-            st.success(f"✅ Highlighted Municipality: **{st.session_state.valid_municipality}**")
-            
-        elif len(matches) > 1:
-            st.info(f"Found multiple matches: {', '.join(matches[:])}... (showing: **{st.session_state.valid_municipality}**)")
-        else:
-            st.warning(f"No match found. Try typing part of the name or removing accents. (showing: **{st.session_state.valid_municipality}**)")
-            
-municipality = st.session_state.valid_municipality
+hospital_stats = load_aggregates("hospitals")
+total_hospitals_count = hospital_stats.national.get('hospital', 0)
+total_clinics_count = hospital_stats.national.get('clinic', 0)
 
-total_hospitals_count = len(hospitals[hospitals['type'] == 'hospital'])
-total_clinics_count = len(hospitals[hospitals['type'] == 'clinic'])
-
-muni_hospitals = hospitals[hospitals['Municipality'] == municipality]
-muni_hospitals_count = len(muni_hospitals[muni_hospitals['type'] == 'hospital'])
-muni_clinics_count = len(muni_hospitals[muni_hospitals['type'] == 'clinic'])
+muni_stats = hospital_stats.municipality(municipality)
+muni_hospitals_count = muni_stats.get('hospital', 0)
+muni_clinics_count = muni_stats.get('clinic', 0)
 
 st.subheader("**National overview**")
 col1, col2 = st.columns(2)
@@ -67,127 +42,16 @@ with col4:
     
 st.markdown("")
 st.markdown("")
+mark("overview")
 
-poly_plot = poly[poly['Municipality'] == municipality]
-hospitals_plot = hospitals.sjoin(poly_plot, how='inner', predicate='intersects')
-
-# Convert to WGS84 (lat/lon) for Folium
-poly_wgs84 = poly_plot.to_crs("EPSG:4326")
-hospitals_wgs84 = hospitals_plot.to_crs("EPSG:4326") if not hospitals_plot.empty else hospitals_plot
-
-# Calculate map center from bounding box
-if poly_wgs84.empty:
-    raise ValueError("Cannot create map: polygon data is empty after filtering.")
-    
-bounds = poly_wgs84.total_bounds  # [minx, miny, maxx, maxy]
-center_lat = (bounds[1] + bounds[3]) / 2
-center_lon = (bounds[0] + bounds[2]) / 2
-
-# Validate that bounds are not NaN
-if pd.isna(center_lat) or pd.isna(center_lon):
-    raise ValueError(f"Invalid bounds calculated. Municipality '{municipality}' may not exist in the data.")
-
-# Create base map
-m = folium.Map(
-    location=[center_lat, center_lon],
-    zoom_start=12,
-    tiles='CartoDB positron'
-)
-
-# --- Layer 1: District Boundaries ---
-boundaries_layer = FeatureGroup(name='District Boundaries', show=True)
-folium.GeoJson(
-    poly_wgs84,
-    style_function=lambda x: {
-        'fillColor': 'transparent',
-        'color': '#333333',
-        'weight': 1,
-        'fillOpacity': 0
-    },
-    tooltip=folium.GeoJsonTooltip(fields=['Municipality'] if 'Municipality' in poly_wgs84.columns else [])
-).add_to(boundaries_layer)
-boundaries_layer.add_to(m)
-
-# --- Layer 2: Healthcare Facilities ---
-hospitals_layer = FeatureGroup(name='Hospitals', show=True)
-clinics_layer = FeatureGroup(name='Clinics', show=True)
-
-if not hospitals_wgs84.empty:
-    for idx, row in hospitals_wgs84.iterrows():
-        # Extract name and type
-        name = row['name'] if 'name' in hospitals_wgs84.columns and pd.notna(row['name']) else 'Unknown'
-        hospital_type = row['type'] if 'type' in hospitals_wgs84.columns and pd.notna(row['type']) else 'Not specified'
-        
-        # Determine if it's a university or school
-        is_clinic = 'clinic' in str(hospital_type).lower()
-        
-        # Set colors based on type
-        if is_clinic:
-            fill_color = '#9b59b6'  # Purple for universities
-            border_color = '#6c3483'
-            radius = 7
-        else:
-            fill_color = '#e63946'  # Red for schools
-            border_color = '#1d3557'
-            radius = 7
-        
-        # Create popup HTML with name and coordinates (shown on click)
-        lat = row.geometry.y
-        lon = row.geometry.x
-        popup_html = f"<b>{name}</b><br>{hospital_type.capitalize()}</br><br>📍 {lat:.5f}, {lon:.5f}"
-        popup = folium.Popup(popup_html, max_width=250)
-        
-        marker = CircleMarker(
-            location=[row.geometry.y, row.geometry.x],
-            radius=radius,
-            color=border_color,
-            fill=True,
-            fill_color=fill_color,
-            fill_opacity=0.8,
-            popup=popup,
-            tooltip=hospital_type  # Show type on hover
-        )
-        
-        # Add to appropriate layer
-        if is_clinic:
-            marker.add_to(clinics_layer)
-        else:
-            marker.add_to(hospitals_layer)
-
-hospitals_layer.add_to(m)
-clinics_layer.add_to(m)
-
-# Add layer control (toggle layers on/off)
-folium.LayerControl(collapsed=False).add_to(m)
+st.subheader("**National map**")
+national_map_section("hospitals")
+mark("national_map")
 
-# --- Custom Legend ---
-legend_html = '''
-<div style="position: fixed; top: 30px; left: 50px; z-index: 9999;
-            background: rgba(255,255,255,0.95); padding: 12px 16px; border-radius: 8px;
-            box-shadow: 0 2px 8px rgba(0,0,0,0.25); font-family: Arial, sans-serif; font-size: 12px;">
-    <h4 style="margin: 0 0 10px 0; color: #333; border-bottom: 1px solid #ddd; padding-bottom: 6px;">Map Legend</h4>
-    <div style="display: flex; align-items: center; margin: 5px 0;">
-        <span style="display: inline-block; width: 12px; height: 12px; background: #e63946; border: 2px solid #1d3557; border-radius: 50%; margin-right: 8px; margin-left: 9px;"></span>Hospital
-    </div>
-    <div style="display: flex; align-items: center; margin: 5px 0;">
-        <span style="display: inline-block; width: 14px; height: 14px; background: #9b59b6; border: 2px solid #6c3483; border-radius: 50%; margin-right: 8px; margin-left: 8px;"></span>Clinic
-    </div>
-    <div style="display: flex; align-items: center; margin: 5px 0;">
-        <span style="display: inline-block; width: 30px; height: 3px; background: #333333; margin-right: 8px;"></span>District Boundary
-    </div>
-</div>
-'''
-m.get_root().html.add_child(folium.Element(legend_html))
+st.subheader("**Healthcare facilities across Serbia**")
+cluster_map_section("hospitals")
+mark("cluster_map")
 
-# Add title
-title_html = f'''
-<div style="position: fixed; top: 10px; left: 50%; transform: translateX(-50%); z-index: 9999;
-            background: rgba(255,255,255,0.9); padding: 10px 20px; border-radius: 8px;
-            box-shadow: 0 2px 6px rgba(0,0,0,0.2); font-family: Arial, sans-serif;">
-    <h3 style="margin: 0; color: #1d3557;">{municipality} – Healthcare Facilities</h3>
-    <p style="margin: 5px 0 0 0; font-size: 12px; color: #666;">Toggle layers using the control on the right</p>
-</div>
-'''
-m.get_root().html.add_child(folium.Element(title_html))
 
-st_folium(m, height=1500, use_container_width=True, returned_objects=[])
\ No newline at end of file
+draw_map("hospitals", municipality)
+finish_run(municipality=municipality)
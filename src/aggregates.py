@@ -0,0 +1,146 @@
+from typing import Any, Dict, List
+
+import pandas as pd
+import geopandas as gpd
+
+from src.gcs import read_parquet_from_gcs
+from src.memory_cache import cached
+from src.storage import get_storage
+from src.timing import span
+from src.utils import BUCKET_NAME, DATA_VERSION, PREPARED_LOADERS, load_poly, load_partition_manifest
+
+
+# Road classes reported on the roads page; any other fclass only counts towards the total.
+ROAD_CLASS_GROUPS: Dict[str, List[str]] = {
+    "trunk": ["trunk"],
+    "primary": ["primary"],
+    "secondary": ["secondary"],
+    "tertiary": ["tertiary"],
+    "link": ["trunk_link", "primary_link", "secondary_link", "tertiary_link"],
+    "local": ["residential", "unclassified", "service"],
+}
+FCLASS_TO_GROUP = {fclass: group for group, fclasses in ROAD_CLASS_GROUPS.items() for fclass in fclasses}
+
+
+class AggregateTable:
+    """
+    Per-municipality metrics for one layer, with the national totals precomputed.
+
+    Rows are kept as plain dicts keyed by municipality name, so both lookups are O(1),
+    never touch geometry and keep integer counts as integers. National totals are the column
+    sums, except those given in by_municipality.attrs["national"] (kept in the Parquet copy).
+    """
+
+    def __init__(self, by_municipality: pd.DataFrame):
+        self.by_municipality = by_municipality
+        self.national: Dict[str, Any] = {
+            column: by_municipality[column].sum().item() for column in by_municipality.columns
+        }
+        self.national.update(by_municipality.attrs.get("national", {}))
+        self._rows: Dict[str, Dict[str, Any]] = by_municipality.to_dict(orient="index")
+        self._empty: Dict[str, Any] = {column: 0 for column in by_municipality.columns}
+
+    def municipality(self, name: str) -> Dict[str, Any]:
+        """Return the metrics row for a municipality, or zeros if it has no features."""
+        return self._rows.get(name, self._empty)
+
+
+def municipality_index(poly: gpd.GeoDataFrame) -> pd.Index:
+    """Index of municipality names that every aggregate table is reindexed to."""
+    return pd.Index(poly["Municipality"].unique(), name="Municipality")
+
+
+def count_lines(pieces: gpd.GeoDataFrame, flag: str) -> int:
+    """
+    Lines with a flag set, counting a line clipped into several municipalities once (its
+    pieces share the line's index label, see src.overlay.clip_lines).
+    """
+    return int(pieces.index[pieces[flag].to_numpy(dtype=bool)].nunique())
+
+
+def aggregate_roads(roads: gpd.GeoDataFrame, index: pd.Index) -> AggregateTable:
+    """Road length by class plus bridge and tunnel counts per municipality."""
+    frame = pd.DataFrame({
+        "Municipality": roads["Municipality"],
+        "road_class": roads["fclass"].astype(object).map(FCLASS_TO_GROUP).fillna("other"),
+        # Pieces are stored as float32; sum in float64 so national totals keep their precision
+        "length_km": roads["length_km"].astype("float64"),
+        "bridges": roads["bridge"],
+        "tunnels": roads["tunnel"],
+    })
+    grouped = frame.groupby(["Municipality", "road_class"], observed=True).sum()
+
+    by_municipality = (
+        grouped["length_km"].unstack(fill_value=0.0)
+        .reindex(index=index, columns=list(ROAD_CLASS_GROUPS), fill_value=0.0)
+    )
+    totals = grouped.groupby(level="Municipality", observed=True).sum().reindex(index, fill_value=0)
+    by_municipality["total_km"] = totals["length_km"]
+    by_municipality["bridges"] = totals["bridges"]
+    by_municipality["tunnels"] = totals["tunnels"]
+    # A bridge or tunnel on a border counts in both municipalities but once nationally
+    by_municipality.attrs["national"] = {"bridges": count_lines(roads, "bridge"), "tunnels": count_lines(roads, "tunnel")}
+    return AggregateTable(by_municipality)
+
+
+def aggregate_rails(rails: gpd.GeoDataFrame, stations: gpd.GeoDataFrame, index: pd.Index) -> AggregateTable:
+    """Railway length, station, bridge and tunnel counts per municipality."""
+    totals = pd.DataFrame({
+        "Municipality": rails["Municipality"],
+        "length_km": rails["length_km"].astype("float64"),
+        "bridges": rails["bridge"],
+        "tunnels": rails["tunnel"],
+    }).groupby("Municipality", observed=True).sum().reindex(index, fill_value=0)
+
+    by_municipality = pd.DataFrame(index=index)
+    by_municipality["length_km"] = totals["length_km"]
+    by_municipality["stations"] = stations.groupby("Municipality", observed=True).size().reindex(index, fill_value=0)
+    by_municipality["bridges"] = totals["bridges"]
+    by_municipality["tunnels"] = totals["tunnels"]
+    by_municipality.attrs["national"] = {"bridges": count_lines(rails, "bridge"), "tunnels": count_lines(rails, "tunnel")}
+    return AggregateTable(by_municipality)
+
+
+def count_by_type(facilities: gpd.GeoDataFrame, index: pd.Index) -> AggregateTable:
+    """Facility counts by `type` per municipality."""
+    counts = facilities.groupby(["Municipality", "type"], observed=True).size().unstack(fill_value=0)
+    counts.columns = counts.columns.astype(str)
+    return AggregateTable(counts.reindex(index, fill_value=0))
+
+
+# Aggregate tables, the prepared layers each is computed from, and the function computing it
+AGGREGATES = {
+    "roads": (["roads"], aggregate_roads),
+    "rails": (["rails", "stations"], aggregate_rails),
+    "schools": (["schools"], count_by_type),
+    "hospitals": (["hospitals"], count_by_type),
+}
+
+
+def aggregate_layer(layer: str, prepared: Dict[str, gpd.GeoDataFrame], index: pd.Index) -> AggregateTable:
+    """Compute a layer's aggregate table from already prepared layers (keyed by PREPARED_LOADERS name)."""
+    inputs, aggregate = AGGREGATES[layer]
+    with span("aggregate", layer=layer):
+        return aggregate(*(prepared[name] for name in inputs), index)
+
+
+@cached
+def build_aggregates(layer: str, version: str = DATA_VERSION) -> AggregateTable:
+    """Compute a layer's aggregate table from the national prepared layers (cached per dataset version)."""
+    inputs, _ = AGGREGATES[layer]
+    prepared = {name: PREPARED_LOADERS[name](version) for name in inputs}
+    return aggregate_layer(layer, prepared, municipality_index(load_poly(version)))
+
+
+@cached
+def load_aggregates(layer: str, version: str = DATA_VERSION) -> AggregateTable:
+    """
+    Load the per-municipality metrics for a layer (cached per dataset version).
+
+    Reads the small aggregate table written by `python -m src.build` when it exists,
+    so the national figures never require the national layer; otherwise computes it.
+    """
+    manifest = load_partition_manifest(version)
+    if manifest is not None and layer in manifest["aggregates"]:
+        return AggregateTable(read_parquet_from_gcs(get_storage(), BUCKET_NAME, manifest["aggregates"][layer]))
+    return build_aggregates(layer, version)
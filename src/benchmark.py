@@ -0,0 +1,223 @@
+"""
+End-to-end page benchmarks on synthetic data.
+
+Run from the repository root:
+
+    python -m src.benchmark                              # scales 1, 5 and 20, every page
+    python -m src.benchmark --scales 1 --pages roads rails --output bench.json
+    python -m src.benchmark --build                      # also run src.build first and time the partitioned path
+    python -m src.benchmark --baseline previous.json     # print changes against an earlier run
+
+For each scale a synthetic dataset (see src/synthetic.py) is written once to
+<data-dir>/scale-<n>/ and served through the local storage backend. Each page then runs
+headlessly through Streamlit's testing API in a fresh process, so the first run is a cold
+load: first the default municipality, then each of the other --municipalities selected
+in the sidebar, with a rerun after each to time the warm path. Without --build the pages
+compute everything from the layers (any artefacts from an earlier --build are removed). Every run records its time,
+the size of the map HTML the page emitted and the peak RSS of the page's process so far.
+Results are written as JSON along with the commit they were measured at.
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from multiprocessing import get_context
+from typing import Dict, List, Optional
+
+from src.storage import LocalBackend
+from src.synthetic import NAMED_MUNICIPALITIES, write_synthetic_dataset
+from src.utils import BUCKET_NAME, PARTITION_ROOT
+
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PAGES = ["roads", "rails", "schools", "hospitals"]
+DEFAULT_SCALES = [1, 5, 20]
+
+
+def _peak_rss_mb() -> float:
+    # On Linux ru_maxrss survives fork and exec, so a spawned page process would report the
+    # parent's peak; VmHWM belongs to the process's own address space
+    try:
+        with open("/proc/self/status", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    # ru_maxrss is in bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def _map_html_bytes(at) -> int:
+    """Size of the Folium HTML passed to the last st_folium component on the page."""
+    components = [node for node in at.main if getattr(node, "type", None) == "component_instance"]
+    if not components:
+        return 0
+    return len(json.loads(components[-1].proto.json_args).get("script", ""))
+
+
+def run_page(page: str, municipalities: List[str], timeout: float) -> List[Dict]:
+    """
+    Benchmark one page in the current process (meant to be a fresh one).
+
+    Returns:
+        One record per municipality with its load and warm rerun times, map HTML size and peak RSS
+    """
+    from streamlit.testing.v1 import AppTest
+
+    if REPO_ROOT not in sys.path:
+        sys.path.insert(0, REPO_ROOT)
+    at = AppTest.from_file(os.path.join(REPO_ROOT, f"{page}.py"), default_timeout=timeout)
+    records = []
+    for position, municipality in enumerate(municipalities):
+        if position > 0:
+            at.text_input(key="highlight_municipality").set_value(municipality)
+        start = time.perf_counter()
+        at.run()
+        load_seconds = time.perf_counter() - start
+        record = {
+            "page": page,
+            "municipality": municipality,
+            "run": "cold" if position == 0 else "select",
+            "load_s": round(load_seconds, 3),
+        }
+        if at.exception:
+            record["error"] = at.exception[0].message
+            records.append(record)
+            break
+        start = time.perf_counter()
+        at.run()
+        record["rerun_s"] = round(time.perf_counter() - start, 3)
+        record["map_html_bytes"] = _map_html_bytes(at)
+        record["peak_rss_mb"] = _peak_rss_mb()
+        records.append(record)
+    return records
+
+
+def run_build(workers: int) -> float:
+    """Run the artefact build in the current process and return its duration in seconds."""
+    from src.build import Build
+
+    start = time.perf_counter()
+    Build(force=True, workers=workers).run()
+    return round(time.perf_counter() - start, 3)
+
+
+def _in_fresh_process(fn, *args):
+    """Run fn(*args) in a newly spawned interpreter, so no cache or import survives between runs."""
+    with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as pool:
+        return pool.submit(fn, *args).result()
+
+
+def _commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def prepare_data(data_dir: str, scale: float, seed: int, data_format: str) -> str:
+    """Write the synthetic dataset for a scale unless it is already there; returns the storage root."""
+    root = os.path.join(data_dir, f"scale-{scale:g}")
+    marker = os.path.join(root, f"complete-{data_format}-{seed}")
+    if not os.path.exists(marker):
+        start = time.perf_counter()
+        write_synthetic_dataset(LocalBackend(root), scale, seed, data_format)
+        open(marker, "w").close()
+        print(f"scale {scale:g}: synthetic data written to {root} in {time.perf_counter() - start:.1f}s")
+    return root
+
+
+def compare(results: List[Dict], baseline: List[Dict]):
+    """Print the change in load time, rerun time and map size for runs present in both result sets."""
+    def key(r):
+        return r["scale"], r["page"], r["municipality"], r["run"], r["partitions"]
+
+    previous = {key(r): r for r in baseline}
+    for record in results:
+        before = previous.get(key(record))
+        if before is None or "error" in record or "error" in before:
+            continue
+        changes = []
+        for metric in ("load_s", "rerun_s", "map_html_bytes", "peak_rss_mb"):
+            if before.get(metric) and record.get(metric) is not None:
+                changes.append(f"{metric} {record[metric] / before[metric] - 1:+.0%}")
+        print(f"{record['scale']:g}x {record['page']:<9} {record['municipality']:<16} {record['run']:<6} " + ", ".join(changes))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the dashboard pages on synthetic data.")
+    parser.add_argument("--scales", type=float, nargs="+", default=DEFAULT_SCALES, help="Multiples of the OSM snapshot size")
+    parser.add_argument("--pages", nargs="+", default=PAGES, help=f"Pages to run (default: {' '.join(PAGES)})")
+    parser.add_argument(
+        "--municipalities", nargs="+", default=NAMED_MUNICIPALITIES[:3],
+        help="Municipalities to view; the first must be the pages' default"
+    )
+    parser.add_argument("--format", choices=["parquet", "geojson"], default="parquet", help="Storage format of the layers")
+    parser.add_argument("--build", action="store_true", help="Build the partitions and aggregates before running the pages")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Processes for the build's clipping stage")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--data-dir", default=os.path.join(REPO_ROOT, "data", "benchmark"), help="Where synthetic datasets are kept")
+    parser.add_argument("--timeout", type=float, default=1800, help="Seconds allowed for a single page run")
+    parser.add_argument("--output", default="benchmark.json", help="JSON file to write the results to")
+    parser.add_argument("--baseline", help="Earlier results JSON to compare against")
+    args = parser.parse_args()
+    unknown = set(args.pages) - set(PAGES)
+    if unknown:
+        parser.error(f"unknown pages: {', '.join(sorted(unknown))}")
+
+    # Inherited by the page processes spawned below
+    os.environ.update({"DASHBOARD_STORAGE": "local", "DASHBOARD_DATA_FORMAT": args.format, "DASHBOARD_PREFETCH": "0"})
+    results = []
+    builds = {}
+    for scale in args.scales:
+        root = prepare_data(args.data_dir, scale, args.seed, args.format)
+        os.environ["DASHBOARD_STORAGE_ROOT"] = root
+        if args.build:
+            builds[f"{scale:g}"] = _in_fresh_process(run_build, args.workers)
+            print(f"scale {scale:g}: build {builds[f'{scale:g}']:.1f}s")
+        else:
+            # Drop artefacts of an earlier --build run so the pages take the on-the-fly path
+            shutil.rmtree(os.path.join(root, BUCKET_NAME, PARTITION_ROOT), ignore_errors=True)
+        for page in args.pages:
+            for record in _in_fresh_process(run_page, page, args.municipalities, args.timeout):
+                record.update(scale=scale, partitions=args.build)
+                results.append(record)
+                print(
+                    f"{scale:g}x {page:<9} {record['municipality']:<16} {record['run']:<6} "
+                    + (f"ERROR {record['error']}" if "error" in record else
+                       f"load {record['load_s']:.2f}s  rerun {record['rerun_s']:.2f}s  "
+                       f"map {record['map_html_bytes'] / 1024:.0f} KiB  peak RSS {record['peak_rss_mb']:.0f} MiB")
+                )
+
+    report = {
+        "commit": _commit(),
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "format": args.format,
+        "seed": args.seed,
+        "builds_s": builds,
+        "results": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"results: {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            compare(results, json.load(f)["results"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+import os
+import json
+import time
+import hashlib
+import tempfile
+import threading
+from contextlib import contextmanager
+from collections import OrderedDict
+from typing import Dict, Iterator, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: no file locking, so one process per cache directory
+    fcntl = None
+
+
+class BlobCache:
+    """
+    Size-capped on-disk cache for blob contents.
+
+    Entries are keyed by bucket and path and stored with the object version (the GCS
+    generation) they were downloaded at, so a lookup only hits when the object in the
+    bucket is unchanged. Once the total size exceeds `max_bytes` the least recently
+    used entries are evicted. The index survives restarts, so a redeploy on the same
+    volume starts warm.
+
+    Several processes (the app and the warmer's workers) can share a directory: the index
+    is rewritten only when an entry is stored, under a file lock and merged with what the
+    other processes wrote since, so every file stays indexed and counts towards the cap.
+    Hits only record the entry's last use in memory, which reaches the index on the next
+    store.
+    """
+
+    INDEX_FILE = "index.json"
+    LOCK_FILE = "index.lock"
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._index = self._load_index()
+
+    @staticmethod
+    def _key(bucket_name: str, file_path: str) -> str:
+        return hashlib.sha256(f"{bucket_name}/{file_path}".encode("utf-8")).hexdigest()
+
+    def _data_path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.bin")
+
+    def _load_index(self) -> "OrderedDict[str, Dict]":
+        try:
+            with open(os.path.join(self.directory, self.INDEX_FILE), "r", encoding="utf-8") as f:
+                entries = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            entries = []
+        # Stored least recently used first; drop entries whose data file has gone missing
+        return OrderedDict(
+            (entry["key"], entry) for entry in entries if os.path.exists(self._data_path(entry["key"]))
+        )
+
+    def _save_index(self):
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(list(self._index.values()), f)
+        os.replace(tmp_path, os.path.join(self.directory, self.INDEX_FILE))
+
+    @contextmanager
+    def _index_lock(self) -> Iterator[None]:
+        """Hold the thread lock and, where supported, the directory's lock file."""
+        with self._lock:
+            if fcntl is None:
+                yield
+                return
+            with open(os.path.join(self.directory, self.LOCK_FILE), "a") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _merge_index(self):
+        """Adopt the index on disk, keeping this process's later uses of the entries it shares."""
+        merged = self._load_index()
+        for key, entry in self._index.items():
+            if key in merged and merged[key]["version"] == entry["version"]:
+                merged[key]["used"] = max(merged[key].get("used", 0), entry.get("used", 0))
+        self._index = OrderedDict(sorted(merged.items(), key=lambda item: item[1].get("used", 0)))
+
+    def get(self, bucket_name: str, file_path: str, version: str) -> Optional[bytes]:
+        """
+        Return the cached contents of a blob if they were stored at the given version.
+
+        Args:
+            bucket_name: Name of the bucket
+            file_path: Path of the blob within the bucket
+            version: Current version of the object (GCS generation or etag)
+
+        Returns:
+            The cached bytes, or None on a miss or version mismatch
+        """
+        key = self._key(bucket_name, file_path)
+        with self._lock:
+            entry = self._index.get(key)
+            if entry is None or entry["version"] != version:
+                self.misses += 1
+                return None
+        try:
+            with open(self._data_path(key), "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            # Evicted by another process: forget it here too
+            with self._lock:
+                if self._index.get(key) is entry:
+                    del self._index[key]
+                self.misses += 1
+            return None
+        with self._lock:
+            if key in self._index:
+                self._index[key]["used"] = time.time()
+                self._index.move_to_end(key)
+            self.hits += 1
+        return data
+
+    def put(self, bucket_name: str, file_path: str, version: str, data: bytes):
+        """Store the contents of a blob at the given version, evicting old entries to stay under the cap."""
+        if len(data) > self.max_bytes:
+            return
+        key = self._key(bucket_name, file_path)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        with self._index_lock():
+            os.replace(tmp_path, self._data_path(key))
+            self._merge_index()
+            self._index.pop(key, None)
+            self._index[key] = {
+                "key": key, "bucket": bucket_name, "path": file_path, "version": version, "size": len(data),
+                "used": time.time(),
+            }
+            self._evict()
+            self._save_index()
+
+    def _evict(self):
+        total = sum(entry["size"] for entry in self._index.values())
+        while total > self.max_bytes and self._index:
+            key, entry = self._index.popitem(last=False)
+            try:
+                os.remove(self._data_path(key))
+            except FileNotFoundError:
+                pass
+            total -= entry["size"]
+            self.evictions += 1
+
+    def stats(self) -> Dict[str, int]:
+        """Return hit/miss/eviction counters and the current entry count and size."""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._index),
+                "bytes": sum(entry["size"] for entry in self._index.values()),
+            }
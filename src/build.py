@@ -0,0 +1,226 @@
+"""
+Offline build pipeline for the dashboard artefacts.
+
+Run from the repository root (uses the storage backend configured as in src/storage.py):
+
+    python -m src.build            # rerun only the stages whose inputs changed
+    python -m src.build --force    # rerun every stage
+    python -m src.build --workers 8   # processes used to clip roads and rails (default: all CPUs)
+
+Stages, per layer:
+    prepare:<layer>     load the source layer with the loaders in src/utils.py, reproject it and
+                        tag municipalities; roads and rails are clipped at municipal borders on a
+                        process pool and each piece measured -> prepared/<layer>.parquet
+    partitions:<layer>  split the prepared layer per municipality and finish it for drawing
+                        (WGS84, simplified, Yes/No labels) -> <layer>/<municipality>.parquet
+    aggregates:<layer>  per-municipality metric tables -> aggregates/<layer>.parquet
+
+For the point layers the manifest also records how many points were assigned to a
+municipality, fell outside every municipality or lay on a border.
+
+Everything is written to partitions/<DATA_VERSION>/ in the bucket, followed by
+manifest.json, which records each stage's input fingerprint, the content hash of every
+output and how long the stage took. A stage is skipped when its fingerprint matches the
+previous manifest. The manifest is written last, so the pages only switch to a build
+once it has completed; restart the app (or bump DATA_VERSION) to pick it up.
+"""
+import argparse
+import hashlib
+import json
+import os
+import re
+import time
+from datetime import datetime, timezone
+from io import BytesIO
+from typing import Callable, Dict, Iterable
+
+import numpy as np
+import geopandas as gpd
+
+from src.gcs import download_blob, read_geoparquet_from_gcs, upload_blob, to_geoparquet_bytes
+from src.storage import get_storage
+from src.utils import (
+    BUCKET_NAME, DATA_VERSION, LINE_LOADERS, POINT_LOADERS, PREPARED_LOADERS, SIMPLIFY_TOLERANCE,
+    layer_blob_path, load_point_assignment, load_poly, normalize, partition_prefix, prepare_line_layer,
+    to_render_layer
+)
+from src.aggregates import AGGREGATES, aggregate_layer, municipality_index
+
+
+# Bump when a stage's code changes its output, so the next build reruns it
+STAGE_VERSION = 7
+
+
+def municipality_slugs(names: Iterable[str]) -> Dict[str, str]:
+    """Map municipality names to unique, accent-free file names."""
+    slugs = {}
+    taken = set()
+    for name in names:
+        base = re.sub(r"[^a-z0-9]+", "-", normalize(name)).strip("-") or "municipality"
+        slug = base
+        suffix = 2
+        while slug in taken:
+            slug = f"{base}-{suffix}"
+            suffix += 1
+        taken.add(slug)
+        slugs[name] = slug
+    return slugs
+
+
+def _sha256(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def _source_fingerprint(name: str) -> str:
+    """Identify the current contents of a source layer from its object metadata, without downloading it."""
+    path = layer_blob_path(name)
+    storage = get_storage()
+    info = storage.stat(BUCKET_NAME, path)
+    if info is None:
+        raise FileNotFoundError(f"{storage.url(BUCKET_NAME, path)} does not exist")
+    return f"{path}@{info.version}:{info.checksum}"
+
+
+class Build:
+    """One run of the pipeline: executes or skips each stage and collects the manifest."""
+
+    def __init__(self, force: bool = False, workers: int = 1):
+        self.force = force
+        self.workers = workers
+        self.prefix = partition_prefix()
+        self.previous = self._load_previous_manifest()
+        self.manifest = {
+            "version": DATA_VERSION,
+            "built_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "stages": {},
+            "layers": {},
+            "aggregates": {},
+            "assignment": {},
+        }
+        self._prepared: Dict[str, gpd.GeoDataFrame] = {}
+
+    def _load_previous_manifest(self) -> dict:
+        try:
+            return json.loads(download_blob(get_storage(), BUCKET_NAME, f"{self.prefix}/manifest.json"))
+        except FileNotFoundError:
+            return {}
+
+    def _upload(self, path: str, data: bytes) -> str:
+        upload_blob(get_storage(), BUCKET_NAME, path, data)
+        return _sha256(data)
+
+    def stage(self, name: str, inputs: dict, run: Callable[[], Dict[str, str]]) -> Dict[str, str]:
+        """
+        Run a stage unless its inputs match the previous build.
+
+        Args:
+            name: Stage name, unique within the build
+            inputs: JSON-serialisable description of everything the stage's output depends on
+            run: Produces the stage outputs and returns {path: sha256}
+
+        Returns:
+            The stage outputs, {path: sha256}
+        """
+        fingerprint = _sha256(json.dumps({"stage_version": STAGE_VERSION, "inputs": inputs}, sort_keys=True).encode())
+        previous = self.previous.get("stages", {}).get(name)
+        if not self.force and previous is not None and previous["fingerprint"] == fingerprint:
+            print(f"{name}: unchanged, skipped")
+            self.manifest["stages"][name] = dict(previous, seconds=0.0, skipped=True)
+            return previous["outputs"]
+
+        start = time.perf_counter()
+        outputs = run()
+        seconds = time.perf_counter() - start
+        print(f"{name}: {seconds:.1f}s, {len(outputs)} files")
+        self.manifest["stages"][name] = {
+            "fingerprint": fingerprint, "outputs": outputs, "seconds": round(seconds, 3), "skipped": False
+        }
+        return outputs
+
+    def prepared(self, layer: str) -> gpd.GeoDataFrame:
+        """The prepared layer, from this run or, if its stage was skipped, from the previous build."""
+        if layer not in self._prepared:
+            self._prepared[layer] = read_geoparquet_from_gcs(
+                get_storage(), BUCKET_NAME, f"{self.prefix}/prepared/{layer}.parquet"
+            )
+        return self._prepared[layer]
+
+    def _prepare(self, layer: str) -> Dict[str, str]:
+        if layer in POINT_LOADERS:
+            summary = load_point_assignment(layer).summary()
+            print(f"{layer}: {summary['assigned']} assigned, {summary['outside']} outside, {summary['boundary']} on a border")
+            self.manifest["assignment"][layer] = summary
+        if layer in LINE_LOADERS:
+            prepared = prepare_line_layer(layer, self.workers)
+        else:
+            prepared = PREPARED_LOADERS[layer]()
+        self._prepared[layer] = prepared
+        path = f"{self.prefix}/prepared/{layer}.parquet"
+        return {path: self._upload(path, to_geoparquet_bytes(prepared))}
+
+    def _partition(self, layer: str, paths: Dict[str, str]) -> Dict[str, str]:
+        prepared = self.prepared(layer)
+        positions = prepared.groupby("Municipality", observed=True).indices
+        outputs = {}
+        for municipality, path in paths.items():
+            part = prepared.iloc[positions.get(municipality, np.array([], dtype=np.intp))]
+            outputs[path] = self._upload(path, to_geoparquet_bytes(to_render_layer(layer, part)))
+        return outputs
+
+    def _aggregate(self, layer: str, path: str) -> Dict[str, str]:
+        inputs, _ = AGGREGATES[layer]
+        table = aggregate_layer(layer, {name: self.prepared(name) for name in inputs}, municipality_index(load_poly()))
+        buffer = BytesIO()
+        table.by_municipality.to_parquet(buffer)
+        return {path: self._upload(path, buffer.getvalue())}
+
+    def run(self) -> dict:
+        """Run every stage, upload the manifest and return it."""
+        poly_fingerprint = _source_fingerprint("poly")
+        slugs = municipality_slugs(load_poly()["Municipality"].unique())
+
+        prepared_outputs = {}
+        for layer in PREPARED_LOADERS:
+            inputs = {"source": _source_fingerprint(layer), "poly": poly_fingerprint}
+            prepared_outputs[layer] = self.stage(f"prepare:{layer}", inputs, lambda: self._prepare(layer))
+            if layer in POINT_LOADERS and layer not in self.manifest["assignment"]:
+                self.manifest["assignment"][layer] = self.previous.get("assignment", {}).get(layer)
+
+        for layer in PREPARED_LOADERS:
+            paths = {municipality: f"{self.prefix}/{layer}/{slug}.parquet" for municipality, slug in slugs.items()}
+            inputs = {"prepared": prepared_outputs[layer], "paths": paths, "simplify": SIMPLIFY_TOLERANCE.get(layer)}
+            self.stage(f"partitions:{layer}", inputs, lambda: self._partition(layer, paths))
+            self.manifest["layers"][layer] = paths
+
+        for layer, (sources, _) in AGGREGATES.items():
+            path = f"{self.prefix}/aggregates/{layer}.parquet"
+            inputs = {"prepared": {name: prepared_outputs[name] for name in sources}, "poly": poly_fingerprint}
+            self.stage(f"aggregates:{layer}", inputs, lambda: self._aggregate(layer, path))
+            self.manifest["aggregates"][layer] = path
+
+        upload_blob(
+            get_storage(), BUCKET_NAME, f"{self.prefix}/manifest.json",
+            json.dumps(self.manifest, ensure_ascii=False, indent=2).encode("utf-8"), content_type="application/json"
+        )
+        return self.manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description=f"Build the dashboard artefacts for {DATA_VERSION}.")
+    parser.add_argument("--force", action="store_true", help="Rerun every stage even if its inputs are unchanged")
+    parser.add_argument(
+        "--workers", type=int, default=os.cpu_count() or 1, help="Processes used to clip lines to municipalities"
+    )
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    manifest = Build(force=args.force, workers=args.workers).run()
+    skipped = sum(stage["skipped"] for stage in manifest["stages"].values())
+    print(
+        f"manifest: {get_storage().url(BUCKET_NAME, f'{partition_prefix()}/manifest.json')} "
+        f"({len(manifest['stages']) - skipped} stages run, {skipped} skipped, {time.perf_counter() - start:.1f}s)"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,236 @@
+"""
+Grid clustering of the facility points, so schools and hospitals can be browsed nationwide.
+
+The points are binned once per dataset version into a hierarchy of square Web Mercator grids,
+one per zoom level, with cells of CLUSTER_CELL_PIXELS on screen: each level halves the cells
+of the one above, so a cell's points always fall in a single cell of every coarser level.
+Binning is done with NumPy on integer cell coordinates, and each cell keeps the centroid of
+its points and their count by type.
+
+cluster_map_section() draws the clusters of the map's current zoom level within its current
+bounds, and the individual points from POINT_ZOOM on. The map reports its view back after
+each pan or zoom, and only the cluster layer is replaced, so the map itself is not reloaded.
+"""
+import math
+from functools import partial
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+import folium
+import streamlit as st
+from folium import FeatureGroup
+
+from src.map_cache import cached_map, map_state, render_feature_group, show_map
+from src.map_layers import point_layer, point_popup_columns
+from src.memory_cache import cached
+from src.national_map import load_national_shapes
+from src.timing import span
+from src.utils import DATA_VERSION, PREPARED_LOADERS, to_render_layer
+
+
+# On-screen size of a grid cell in pixels (Leaflet tiles are 256 px)
+CLUSTER_CELL_PIXELS = 64
+# Zoom levels drawn as clusters; from POINT_ZOOM on the points are drawn individually
+CLUSTER_MIN_ZOOM = 6
+POINT_ZOOM = 13
+# Zoom the map opens at
+CLUSTER_START_ZOOM = 7
+# Bump when the cluster map changes what it draws
+CLUSTER_MAP_VERSION = 1
+# Per layer: type matched (case-insensitively) by the highlighted points, and the two categories' names
+FACILITY_CATEGORIES = {
+    "schools": ("university", "Schools", "Universities"),
+    "hospitals": ("clinic", "Hospitals", "Clinics"),
+}
+# (circle colour, fill colour) of the regular and highlighted points, as on the municipality maps
+FACILITY_STYLES = {False: ('#1d3557', '#e63946'), True: ('#6c3483', '#9b59b6')}
+CLUSTER_COLOR = '#1d3557'
+CLUSTER_FILL_COLOR = '#457b9d'
+
+
+def mercator_xy(lon: np.ndarray, lat: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Web Mercator position as a fraction of the world, x east and y south from the top-left corner."""
+    x = (np.asarray(lon, dtype="float64") + 180) / 360
+    sin_lat = np.sin(np.radians(np.clip(lat, -85.05112878, 85.05112878)))
+    y = 0.5 - np.log((1 + sin_lat) / (1 - sin_lat)) / (4 * np.pi)
+    return x, y
+
+
+class ClusterLevel:
+    """The non-empty grid cells of one zoom level: centroid, point count and count per type."""
+
+    def __init__(self, lon: np.ndarray, lat: np.ndarray, counts: np.ndarray):
+        self.lon = lon
+        self.lat = lat
+        # (cells, types) point counts
+        self.counts = counts
+        self.total = counts.sum(axis=1)
+
+    def __len__(self) -> int:
+        return len(self.total)
+
+
+class PointClusters:
+    """A layer's points and their ClusterLevel for each zoom from CLUSTER_MIN_ZOOM to POINT_ZOOM - 1."""
+
+    def __init__(self, layer: str, points: gpd.GeoDataFrame, types: List[str], levels: Dict[int, ClusterLevel]):
+        self.layer = layer
+        # WGS84 points with the popup columns of point_popup_columns()
+        self.points = points
+        self.types = types
+        self.levels = levels
+        self._lon = points.geometry.x.to_numpy()
+        self._lat = points.geometry.y.to_numpy()
+
+    def clusters_in(self, zoom: int, bounds: Tuple[float, float, float, float]) -> Tuple[ClusterLevel, np.ndarray]:
+        """The level drawn at `zoom` and the positions of its cells whose centroid is within (minx, miny, maxx, maxy)."""
+        level = self.levels[min(max(zoom, CLUSTER_MIN_ZOOM), POINT_ZOOM - 1)]
+        return level, np.flatnonzero(_within(level.lon, level.lat, bounds))
+
+    def points_in(self, bounds: Tuple[float, float, float, float]) -> gpd.GeoDataFrame:
+        """The points within (minx, miny, maxx, maxy)."""
+        return self.points[_within(self._lon, self._lat, bounds)]
+
+
+def _within(lon: np.ndarray, lat: np.ndarray, bounds: Tuple[float, float, float, float]) -> np.ndarray:
+    minx, miny, maxx, maxy = bounds
+    return (lon >= minx) & (lon <= maxx) & (lat >= miny) & (lat <= maxy)
+
+
+def cluster_points(layer: str, points: gpd.GeoDataFrame, type_column: str = "type_label") -> PointClusters:
+    """
+    Bin WGS84 points into the grid of every cluster zoom level.
+
+    The cell of each point is computed once at the finest level; coarser levels drop the low
+    bits of its integer cell coordinates, so the whole hierarchy costs one np.unique and a
+    few np.bincount calls per level.
+    """
+    types = pd.Categorical(points[type_column].astype(object).fillna("Not specified"))
+    codes = types.codes.astype(np.int64)
+    lon = points.geometry.x.to_numpy()
+    lat = points.geometry.y.to_numpy()
+    x, y = mercator_xy(lon, lat)
+
+    finest = POINT_ZOOM - 1
+    cells_per_side = (1 << finest) * 256 // CLUSTER_CELL_PIXELS
+    column = np.clip((x * cells_per_side).astype(np.int64), 0, cells_per_side - 1)
+    row = np.clip((y * cells_per_side).astype(np.int64), 0, cells_per_side - 1)
+
+    n_types = len(types.categories)
+    levels = {}
+    for zoom in range(CLUSTER_MIN_ZOOM, POINT_ZOOM):
+        shift = finest - zoom
+        cell = ((column >> shift) << 32) | (row >> shift)
+        _, inverse = np.unique(cell, return_inverse=True)
+        n_cells = int(inverse.max()) + 1 if len(inverse) else 0
+        total = np.bincount(inverse, minlength=n_cells)
+        counts = np.bincount(inverse * n_types + codes, minlength=n_cells * n_types).reshape(n_cells, n_types)
+        levels[zoom] = ClusterLevel(
+            np.bincount(inverse, weights=lon, minlength=n_cells) / np.maximum(total, 1),
+            np.bincount(inverse, weights=lat, minlength=n_cells) / np.maximum(total, 1),
+            counts,
+        )
+    return PointClusters(layer, points, [str(name) for name in types.categories], levels)
+
+
+@cached
+def load_point_clusters(layer: str, version: str = DATA_VERSION) -> PointClusters:
+    """Every point of a facility layer, clustered for each zoom level (cached per dataset version)."""
+    points = point_popup_columns(to_render_layer(layer, PREPARED_LOADERS[layer](version)))
+    with span("cluster_points", layer=layer, rows=len(points)) as s:
+        clusters = cluster_points(layer, points)
+        s.set(cells={zoom: len(level) for zoom, level in clusters.levels.items()})
+    return clusters
+
+
+def cluster_base_map(version: str = DATA_VERSION) -> folium.Map:
+    """The cluster map without its points: municipality outlines, framed on the whole country."""
+    shapes = load_national_shapes(version)
+    minx, miny, maxx, maxy = shapes.total_bounds
+    m = folium.Map(
+        location=[(miny + maxy) / 2, (minx + maxx) / 2], zoom_start=CLUSTER_START_ZOOM, tiles='CartoDB positron'
+    )
+    folium.GeoJson(
+        shapes[["Municipality", "geometry"]],
+        style_function=lambda feature: {'fillColor': 'transparent', 'color': '#333333', 'weight': 0.5, 'fillOpacity': 0},
+        tooltip=folium.GeoJsonTooltip(fields=['Municipality'], labels=False),
+    ).add_to(m)
+    return m
+
+
+def cluster_layer(clusters: PointClusters, zoom: int, bounds: Tuple[float, float, float, float]) -> FeatureGroup:
+    """The clusters or points to draw at a zoom level within bounds, as one feature group."""
+    group = FeatureGroup(name="Facilities")
+    if zoom >= POINT_ZOOM:
+        highlight, name, highlighted_name = FACILITY_CATEGORIES[clusters.layer]
+        points = clusters.points_in(bounds)
+        is_highlighted = points["type_label"].str.contains(highlight, case=False)
+        for flag, layer_name in ((False, name), (True, highlighted_name)):
+            color, fill_color = FACILITY_STYLES[flag]
+            point_layer(
+                points[is_highlighted == flag], layer_name, color=color, fill_color=fill_color, radius=7,
+                popup_fields=['name', 'type_label', 'coordinates'], tooltip_field='type_label'
+            ).add_to(group)
+        return group
+
+    level, cells = clusters.clusters_in(zoom, bounds)
+    if not len(cells):
+        return group
+    total = level.total[cells]
+    summaries = []
+    for counts, count in zip(level.counts[cells].tolist(), total.tolist()):
+        by_type = sorted(zip(counts, clusters.types), reverse=True)
+        summaries.append(f"<b>{count:,}</b><br>" + "<br>".join(f"{name}: {n:,}" for n, name in by_type if n))
+    features = gpd.GeoDataFrame(
+        {
+            "summary": summaries,
+            # Circle area grows with the count, up to the cell size
+            "radius": np.minimum(5 + 3 * np.log2(total), CLUSTER_CELL_PIXELS / 2 - 4).round(1),
+        },
+        geometry=gpd.points_from_xy(level.lon[cells], level.lat[cells]),
+        crs="EPSG:4326",
+    )
+    folium.GeoJson(
+        features,
+        marker=folium.CircleMarker(color=CLUSTER_COLOR, fill=True, fill_color=CLUSTER_FILL_COLOR, fill_opacity=0.7, weight=1),
+        style_function=lambda feature: {'radius': feature['properties']['radius']},
+        tooltip=folium.GeoJsonTooltip(fields=['summary'], labels=False),
+    ).add_to(group)
+    return group
+
+
+def _view(state: Optional[Dict[str, Any]]) -> Tuple[int, Tuple[float, float, float, float]]:
+    """Zoom and bounds (minx, miny, maxx, maxy) the map last reported, or those it opens at."""
+    if state and state.get("zoom") is not None and state.get("bounds"):
+        south_west, north_east = state["bounds"]["_southWest"], state["bounds"]["_northEast"]
+        minx, miny, maxx, maxy = south_west["lng"], south_west["lat"], north_east["lng"], north_east["lat"]
+        if None not in (minx, miny, maxx, maxy):
+            # Half a screen of margin, so short pans do not uncover an empty edge before the rerun
+            pad_x, pad_y = (maxx - minx) / 2, (maxy - miny) / 2
+            return int(state["zoom"]), (minx - pad_x, miny - pad_y, maxx + pad_x, maxy + pad_y)
+    return CLUSTER_START_ZOOM, (-math.inf, -math.inf, math.inf, math.inf)
+
+
+@st.fragment
+def cluster_map_section(layer: str, height: int = 700, version: str = DATA_VERSION):
+    """
+    A nationwide map of a facility layer (key in FACILITY_CATEGORIES), clustered to the
+    current zoom. A fragment, so panning and zooming rerun only this map.
+    """
+    clusters = load_point_clusters(layer, version)
+    settings = {"map_version": CLUSTER_MAP_VERSION}
+    base = cached_map("clusters", "", partial(cluster_base_map, version), settings, version)
+    zoom, bounds = _view(map_state(base))
+    with span("cluster_layer", layer=layer, zoom=zoom) as s:
+        group = cluster_layer(clusters, zoom, bounds)
+        feature_group = render_feature_group(group)
+        s.set(chars=len(feature_group))
+    show_map(
+        base, height=height, use_container_width=True, returned_objects=["zoom", "bounds"], feature_group=feature_group
+    )
+    st.caption(
+        f"Zoom in to level {POINT_ZOOM} or closer to see individual facilities; "
+        "hover over a circle for its count by type."
+    )
@@ -0,0 +1,38 @@
+"""
+Convert the dashboard's GeoJSON layers (and the schools CSV) in the bucket to GeoParquet.
+
+Run from the repository root (uses the storage backend configured as in src/storage.py):
+
+    python -m src.convert            # all layers
+    python -m src.convert roads rails
+
+The pages read the converted files when DASHBOARD_DATA_FORMAT=parquet.
+"""
+import argparse
+
+from src.gcs import convert_geojson_to_geoparquet, to_geoparquet_bytes, upload_blob
+from src.storage import get_storage
+from src.utils import BUCKET_NAME, LAYER_PATHS, read_school_csv
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert the dashboard layers in GCS to GeoParquet.")
+    parser.add_argument("layers", nargs="*", help=f"Layers to convert (default: all of {', '.join(LAYER_PATHS)})")
+    args = parser.parse_args()
+    unknown = set(args.layers) - set(LAYER_PATHS)
+    if unknown:
+        parser.error(f"unknown layers: {', '.join(sorted(unknown))}")
+
+    storage = get_storage()
+    for name in args.layers or LAYER_PATHS:
+        path = LAYER_PATHS[name]
+        if name == "schools":
+            target = f"{path}.parquet"
+            upload_blob(storage, BUCKET_NAME, target, to_geoparquet_bytes(read_school_csv()))
+        else:
+            target = convert_geojson_to_geoparquet(storage, BUCKET_NAME, f"{path}.geojson", target_path=f"{path}.parquet")
+        print(f"{name}: {storage.url(BUCKET_NAME, target)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+"""
+deck.gl (pydeck) layer builders for the alternative map backend (see src/deck_maps.py).
+
+Features are sent to the browser as compact records rather than GeoJSON: a path or position
+with coordinates rounded to 1e-5 degrees (about a metre) and two short tooltip strings, under
+one-letter keys. Colour and width are set once per layer and applied by deck.gl on the GPU,
+so each feature carries nothing but its geometry and tooltip. Records are built column-wise
+from the coordinate arrays, without a Python object per feature beyond the record itself.
+"""
+import json
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+import shapely
+import geopandas as gpd
+import pydeck as pdk
+
+
+# Decimal places kept in coordinates (1e-5 degrees is ~1 m at Serbia's latitudes)
+COORDINATE_DECIMALS = 5
+# CSS colour names used by the Folium maps
+NAMED_COLORS = {"black": "#000000", "blue": "#0000ff", "brown": "#a52a2a", "pink": "#ffc0cb"}
+# One tooltip for every layer: the feature's label in bold over its detail line
+TOOLTIP = {
+    "html": "<b>{l}</b><br/>{d}",
+    "style": {"backgroundColor": "white", "color": "#333", "fontSize": "12px"},
+}
+
+
+def rgba(color: str, opacity: float = 1.0) -> List[int]:
+    """[r, g, b, a] of a hex or NAMED_COLORS colour, as deck.gl expects."""
+    value = NAMED_COLORS.get(color, color).lstrip("#")
+    return [int(value[i:i + 2], 16) for i in (0, 2, 4)] + [round(opacity * 255)]
+
+
+def _labels(values: Optional[Sequence[Any]], length: int) -> List[str]:
+    if values is None:
+        return [""] * length
+    return pd.Series(values, dtype=object).fillna("").astype(str).tolist()
+
+
+def line_records(
+    lines: gpd.GeoSeries, labels: Optional[Sequence[Any]] = None, details: Optional[Sequence[Any]] = None,
+    decimals: int = COORDINATE_DECIMALS
+) -> List[Dict[str, Any]]:
+    """
+    One record per line part: {"p": [[lon, lat], ...], "l": label, "d": detail}.
+
+    Args:
+        lines: Line (or polygon boundary) geometries in EPSG:4326
+        labels: Tooltip label of each line
+        details: Tooltip detail line of each line
+        decimals: Decimal places kept in coordinates
+    """
+    parts, owner = shapely.get_parts(np.asarray(lines.values), return_index=True)
+    coords, part_of = shapely.get_coordinates(parts, return_index=True)
+    flat = np.round(coords, decimals).tolist()
+    ends = np.cumsum(np.bincount(part_of, minlength=len(parts))).tolist()
+    labels = _labels(labels, len(lines))
+    details = _labels(details, len(lines))
+    records = []
+    start = 0
+    for end, line in zip(ends, owner.tolist()):
+        if end - start >= 2:
+            records.append({"p": flat[start:end], "l": labels[line], "d": details[line]})
+        start = end
+    return records
+
+
+def point_records(
+    points: gpd.GeoSeries, labels: Optional[Sequence[Any]] = None, details: Optional[Sequence[Any]] = None
+) -> List[Dict[str, Any]]:
+    """One record per point: {"p": [lon, lat], "l": label, "d": detail}."""
+    coords = np.round(shapely.get_coordinates(np.asarray(points.values)), COORDINATE_DECIMALS).tolist()
+    return [
+        {"p": position, "l": label, "d": detail}
+        for position, label, detail in zip(coords, _labels(labels, len(points)), _labels(details, len(points)))
+    ]
+
+
+def path_layer(
+    layer_id: str, records: List[Dict[str, Any]], color: str, width: float, opacity: float = 0.85
+) -> pdk.Layer:
+    """Lines drawn with one colour and pixel width."""
+    return pdk.Layer(
+        "PathLayer", data=records, id=layer_id, get_path="p", get_color=rgba(color, opacity), get_width=width,
+        width_units="pixels", cap_rounded=True, joint_rounded=True, pickable=True
+    )
+
+
+def scatter_layer(
+    layer_id: str, records: List[Dict[str, Any]], color: str, fill_color: str, radius: float, fill_opacity: float = 0.8
+) -> pdk.Layer:
+    """Circles of a fixed pixel radius with one fill and outline colour."""
+    return pdk.Layer(
+        "ScatterplotLayer", data=records, id=layer_id, get_position="p", get_radius=radius, radius_units="pixels",
+        get_fill_color=rgba(fill_color, fill_opacity), get_line_color=rgba(color), stroked=True,
+        line_width_min_pixels=1, pickable=True
+    )
+
+
+def boundary_layer(boundary: gpd.GeoDataFrame) -> pdk.Layer:
+    """Municipality outline, labelled with its name."""
+    records = line_records(boundary.geometry.boundary, boundary["Municipality"], None)
+    return path_layer("boundaries", records, "#333333", 1, opacity=1.0)
+
+
+class RenderedDeck:
+    """
+    A pydeck chart serialised once, so cached renders skip rebuilding the layers' data.
+
+    st.pydeck_chart() only calls to_json() on the deck and reads its _tooltip (Streamlit
+    1.45, pinned in requirements.txt), so a RenderedDeck is drawn by passing it in place of
+    the pydeck.Deck.
+    """
+
+    def __init__(self, spec: str, tooltip: Dict[str, Any], title: str, legend: List[Tuple[str, str]]):
+        self.spec = spec
+        self._tooltip = tooltip
+        self.title = title
+        # (label, CSS colour) pairs shown above the chart
+        self.legend = legend
+
+    def to_json(self) -> str:
+        return self.spec
+
+    @property
+    def size(self) -> int:
+        """Characters sent to the browser."""
+        return len(self.spec)
+
+    def legend_html(self) -> str:
+        """The title and legend as one line of HTML for st.markdown."""
+        items = "".join(
+            f'<span style="display: inline-block; margin-right: 14px;">'
+            f'<span style="display: inline-block; width: 24px; height: 4px; background: {color}; '
+            f'vertical-align: middle; margin-right: 6px;"></span>{label}</span>'
+            for label, color in self.legend
+        )
+        return f'<div style="font-size: 13px;"><b>{self.title}</b><br/>{items}</div>'
+
+
+def render_deck(
+    layers: List[pdk.Layer], bounds: Sequence[float], title: str, legend: List[Tuple[str, str]], zoom: float = 12
+) -> RenderedDeck:
+    """
+    Serialise a deck of layers centred on a bounding box, on the CARTO Positron basemap
+    (the Folium maps' tiles; no token needed).
+
+    pydeck indents its JSON, which for thousands of coordinates is mostly whitespace, so the
+    deck is serialised without data and the records are written into it compactly.
+    """
+    data = {layer.id: layer.data for layer in layers}
+    for layer in layers:
+        layer.data = []
+    minx, miny, maxx, maxy = bounds
+    deck = pdk.Deck(
+        layers=layers,
+        initial_view_state=pdk.ViewState(latitude=(miny + maxy) / 2, longitude=(minx + maxx) / 2, zoom=zoom),
+        map_provider="carto",
+        map_style=pdk.map_styles.CARTO_LIGHT,
+        tooltip=TOOLTIP,
+    )
+    spec = json.loads(deck.to_json())
+    for layer in spec["layers"]:
+        layer["data"] = data[layer["id"]]
+    return RenderedDeck(json.dumps(spec, separators=(",", ":"), ensure_ascii=False), TOOLTIP, title, legend)
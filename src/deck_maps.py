@@ -0,0 +1,188 @@
+"""
+The infrastructure pages' maps drawn with deck.gl (pydeck) instead of Folium.
+
+Same layers, colours and tooltips as src/page_maps.py, but each layer is one deck.gl layer
+with a single colour and width, and features are sent as compact records (see
+src/deck_layers.py) that the browser draws on the GPU. That keeps tens of thousands of road
+segments responsive where Leaflet's SVG rendering slows down. deck.gl has no layer control
+or popups: the layers are always shown and hovering a feature shows its tooltip.
+
+national_roads_deck() draws the whole road network the same way, which Folium cannot do at
+usable frame rates; it is built once per dataset version.
+
+Pick the backend with DASHBOARD_MAP_BACKEND (see map_backend in src/page_maps.py).
+"""
+from functools import partial
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import geopandas as gpd
+import pydeck as pdk
+
+from src.deck_layers import (
+    COORDINATE_DECIMALS, RenderedDeck, boundary_layer, line_records, path_layer, point_records, render_deck, scatter_layer
+)
+from src.map_cache import get_render_cache
+from src.map_layers import ROAD_LAYERS, point_popup_columns
+from src.timing import span
+from src.utils import DATA_VERSION, load_municipality_layer, load_prepared_roads, municipality_shape, to_render_layer
+
+
+BRIDGE_COLOR = "#2a9d8f"
+TUNNEL_COLOR = "#6c757d"
+# Bump when a builder below changes what it draws
+DECK_MAP_VERSION = 2
+# Decimal places (~10 m) of the national road network's coordinates, finer than it is drawn at
+NATIONAL_ROADS_DECIMALS = 4
+# Zoom the national road network opens at, framing the whole country
+NATIONAL_ROADS_ZOOM = 7
+
+
+def _shape(municipality: str):
+    shape = municipality_shape(municipality)
+    if shape is None:
+        raise ValueError(f"Municipality '{municipality}' not found in the data.")
+    return shape
+
+
+def _road_layers(
+    roads: gpd.GeoDataFrame, places: Optional[Sequence[str]] = None, decimals: int = COORDINATE_DECIMALS
+) -> Tuple[List[pdk.Layer], List[Tuple[str, str]]]:
+    """
+    One layer per road class, bridges and tunnels on top, and their legend entries.
+
+    Args:
+        roads: Render-ready roads (see src.utils.to_render_layer)
+        places: Text put before each road's bridge/tunnel detail in its tooltip, e.g. its municipality
+        decimals: Decimal places kept in coordinates
+    """
+    fclass = roads["fclass"].astype(object)
+    is_bridge = (roads["bridge"] == "Yes").to_numpy()
+    is_tunnel = (roads["tunnel"] == "Yes").to_numpy()
+    details = np.select([is_bridge, is_tunnel], ["🌉 Bridge", "🚇 Tunnel"], "")
+    if places is not None:
+        details = np.array([f"{place} {detail}".rstrip() for place, detail in zip(places, details)], dtype=object)
+
+    layers = []
+    legend = []
+    plain = ~(is_bridge | is_tunnel)
+    for layer_name, config in ROAD_LAYERS.items():
+        in_class = fclass.isin(config["fclass"]).to_numpy()
+        selected = in_class & plain
+        records = line_records(roads.geometry[selected], fclass[selected], details[selected], decimals)
+        layers.append(path_layer(layer_name, records, config["color"], config["weight"]))
+        legend.append((layer_name.replace(" Roads", ""), config["color"]))
+    # Bridges and tunnels of any drawn class, in their own colour (as the Folium map styles them)
+    drawn = fclass.isin([value for config in ROAD_LAYERS.values() for value in config["fclass"]]).to_numpy()
+    for layer_name, mask, color in (("Bridges", is_bridge, BRIDGE_COLOR), ("Tunnels", is_tunnel & ~is_bridge, TUNNEL_COLOR)):
+        selected = mask & drawn
+        records = line_records(roads.geometry[selected], fclass[selected], details[selected], decimals)
+        layers.append(path_layer(layer_name, records, color, 3))
+        legend.append((layer_name, color))
+    return layers, legend
+
+
+def roads_deck(municipality: str) -> RenderedDeck:
+    """Road Infrastructure map of one municipality: one layer per road class, bridges and tunnels on top."""
+    shape = _shape(municipality)
+    layers, legend = _road_layers(load_municipality_layer("roads", municipality))
+    legend.append(("District Boundaries", "#333333"))
+    return render_deck([boundary_layer(shape.boundary)] + layers, shape.bounds, "Serbia – National Road Network via OSM", legend)
+
+
+def build_national_roads_deck(version: str = DATA_VERSION) -> RenderedDeck:
+    """Every road in the country, styled as on the municipality maps, with its municipality in the tooltip."""
+    roads = to_render_layer("roads", load_prepared_roads(version))
+    layers, legend = _road_layers(roads, roads["Municipality"].astype(str).tolist(), NATIONAL_ROADS_DECIMALS)
+    return render_deck(
+        layers, roads.total_bounds, "Serbia – National Road Network via OSM", legend, zoom=NATIONAL_ROADS_ZOOM
+    )
+
+
+def rails_deck(municipality: str) -> RenderedDeck:
+    """Rail Infrastructure map of one municipality: tracks by type and the train stations."""
+    shape = _shape(municipality)
+    rails = load_municipality_layer("rails", municipality)
+    stations = point_popup_columns(load_municipality_layer("stations", municipality), name_default='Unknown Station')
+    is_bridge = (rails["bridge"] == "Yes").to_numpy()
+    is_tunnel = (rails["tunnel"] == "Yes").to_numpy()
+    track = np.select([is_bridge, is_tunnel], ["bridge", "tunnel"], "regular")
+    details = np.select(
+        [is_bridge & is_tunnel, is_bridge, is_tunnel], ["🌉 Bridge, 🚇 Tunnel", "🌉 Bridge", "🚇 Tunnel"], "🛤️ Regular track"
+    )
+
+    layers = [boundary_layer(shape.boundary)]
+    track_colors = {'regular': '#e63946', 'bridge': BRIDGE_COLOR, 'tunnel': TUNNEL_COLOR}
+    for name, color in track_colors.items():
+        selected = track == name
+        records = line_records(rails.geometry[selected], ["Railway"] * int(selected.sum()), details[selected])
+        layers.append(path_layer(f"rails-{name}", records, color, 3, opacity=0.9))
+    layers.append(scatter_layer(
+        "stations", point_records(stations.geometry, stations["name"], ["Train station"] * len(stations)),
+        color='#1d3557', fill_color='#457b9d', radius=3, fill_opacity=0.9
+    ))
+    legend = [
+        ("Railway Line", "#e63946"), ("Train Station", "#457b9d"), ("District Boundary", "#333333"),
+        ("Bridge", BRIDGE_COLOR), ("Tunnel", TUNNEL_COLOR),
+    ]
+    return render_deck(layers, shape.bounds, f"{municipality} – Railway Network via OSM", legend)
+
+
+def _facilities_deck(
+    layer: str, municipality: str, title: str, highlight: str, names: Dict[bool, str]
+) -> RenderedDeck:
+    shape = _shape(municipality)
+    points = point_popup_columns(load_municipality_layer(layer, municipality))
+    highlighted = points["type_label"].str.contains(highlight, case=False).to_numpy()
+    layers = [boundary_layer(shape.boundary)]
+    styles = {False: ('#1d3557', '#e63946'), True: ('#6c3483', '#9b59b6')}
+    for is_highlighted, (color, fill_color) in styles.items():
+        selected = points[highlighted == is_highlighted]
+        layers.append(scatter_layer(
+            names[is_highlighted], point_records(selected.geometry, selected["name"], selected["type_label"]),
+            color=color, fill_color=fill_color, radius=7
+        ))
+    legend = [(names[False], '#e63946'), (names[True], '#9b59b6'), ("District Boundary", "#333333")]
+    return render_deck(layers, shape.bounds, f"{municipality} – {title}", legend)
+
+
+def schools_deck(municipality: str) -> RenderedDeck:
+    """Schools & Universities map of one municipality."""
+    return _facilities_deck("schools", municipality, "Schools & Universities", "university", {False: "Schools", True: "Universities"})
+
+
+def hospitals_deck(municipality: str) -> RenderedDeck:
+    """Healthcare Facilities map of one municipality."""
+    return _facilities_deck("hospitals", municipality, "Healthcare Facilities", "clinic", {False: "Hospitals", True: "Clinics"})
+
+
+DECK_MAPS: Dict[str, Callable[[str], RenderedDeck]] = {
+    "roads": roads_deck,
+    "rails": rails_deck,
+    "schools": schools_deck,
+    "hospitals": hospitals_deck,
+}
+
+
+def _cached_deck(page: str, municipality: str, build: Callable[[], RenderedDeck], version: str) -> RenderedDeck:
+    key = ("deck", page, municipality, version, DECK_MAP_VERSION)
+    built = []
+
+    def render() -> RenderedDeck:
+        built.append(True)
+        return build()
+
+    with span("render_deck", page=page) as s:
+        rendered = get_render_cache().get_or_compute(key, render, version)
+        s.set(cache="miss" if built else "hit", chars=rendered.size)
+    return rendered
+
+
+def deck_map(page: str, municipality: str, version: str = DATA_VERSION) -> RenderedDeck:
+    """The deck.gl map of a page (key in DECK_MAPS) for a municipality, built only on a render cache miss."""
+    return _cached_deck(page, municipality, partial(DECK_MAPS[page], municipality), version)
+
+
+def national_roads_deck(version: str = DATA_VERSION) -> RenderedDeck:
+    """The whole road network, built once per dataset version and then served from the render cache."""
+    return _cached_deck("roads-national", "", partial(build_national_roads_deck, version), version)
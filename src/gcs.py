@@ -1,66 +1,213 @@
-from typing import Any
+import os
+import json
+from typing import Any, List, Optional
 from io import BytesIO
 
 import pandas as pd
 import geopandas as gpd
+import pyarrow.parquet as pq
 import streamlit as st
-from google.cloud import storage
 from PIL import Image
 
+from src.blob_cache import BlobCache
+from src.storage import ObjectChangedError, StorageBackend
+from src.timing import span
+
+
+@st.cache_resource
+def get_blob_cache() -> BlobCache:
+    """
+    Create the process-wide on-disk blob cache.
+    The directory and size cap are configured with DASHBOARD_BLOB_CACHE_DIR and
+    DASHBOARD_BLOB_CACHE_MAX_MB.
+    """
+    directory = os.environ.get(
+        "DASHBOARD_BLOB_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "gpbp-infra-dashboard", "blobs")
+    )
+    max_mb = int(os.environ.get("DASHBOARD_BLOB_CACHE_MAX_MB", "2048"))
+    return BlobCache(directory, max_mb * 1024 * 1024)
+
+
+# Times download_blob looks an object up again when it is replaced while being read
+READ_ATTEMPTS = 3
+
+
+def download_blob(storage: StorageBackend, bucket_name: str, file_path: str) -> bytes:
+    """
+    Download a blob's contents. For remote backends they are served from the on-disk cache
+    when the object is unchanged, in which case only the object metadata is fetched.
+    
+    Args:
+        storage (StorageBackend): Backend holding the bucket.
+        bucket_name (str): Name of the bucket.
+        file_path (str): Path to the file within the bucket.
+        
+    Returns:
+        bytes: The blob contents.
+    """
+    with span("download", path=file_path) as s:
+        if not storage.cacheable:
+            data = storage.read(bucket_name, file_path)
+            s.set(bytes=len(data))
+            return data
+        cache = get_blob_cache()
+        for attempt in range(READ_ATTEMPTS):
+            info = storage.stat(bucket_name, file_path)
+            if info is None:
+                raise FileNotFoundError(f"{storage.url(bucket_name, file_path)} does not exist")
+            data = cache.get(bucket_name, file_path, info.version)
+            s.set(cache="hit" if data is not None else "miss")
+            if data is not None:
+                break
+            try:
+                data = storage.read(bucket_name, file_path, info.version)
+            except ObjectChangedError:
+                # Replaced between stat and read: look the new version up and read that
+                if attempt == READ_ATTEMPTS - 1:
+                    raise
+                continue
+            cache.put(bucket_name, file_path, info.version, data)
+            break
+        s.set(bytes=len(data))
+        return data
+
 
 @st.cache_data(ttl=3600)
 def get_image_from_gcs(
-    _storage_client: storage.Client, bucket_name: str, image_name: str
+    _storage: StorageBackend, bucket_name: str, image_name: str
 ) -> Image.Image:
     """
-    Fetch and open an image from Google Cloud Storage.
+    Fetch and open an image from storage.
     Results are cached for 1 hour.
     
     Args:
-        _storage_client (storage.Client): Authenticated GCS client.
-        bucket_name (str): Name of the GCS bucket containing the image.
+        _storage (StorageBackend): Backend holding the bucket (not hashed).
+        bucket_name (str): Name of the bucket containing the image.
         image_name (str): Full path to the image file within the bucket.
         
     Returns:
         Image.Image: Opened PIL Image object.
     """
-    bucket = _storage_client.bucket(bucket_name)
-    blob = bucket.blob(image_name)
-    image_data = blob.download_as_bytes()
+    image_data = download_blob(_storage, bucket_name, image_name)
     image = Image.open(BytesIO(image_data))
     return image
 
-@st.cache_data(ttl=3600)
 def read_geojson_from_gcs(
-    _storage_client: storage.Client, bucket_name: str, file_path: str
+    storage: StorageBackend, bucket_name: str, file_path: str
 ) -> gpd.GeoDataFrame:
     """
-    Fetch and open a GeoJSON file from Google Cloud Storage.
-    Results are cached for 1 hour.
+    Fetch and open a GeoJSON file from storage.
+    Not cached: callers cache the layers they build from it (see src.memory_cache).
     """
-    bucket = _storage_client.bucket(bucket_name)
-    blob = bucket.blob(file_path)
-    data = blob.download_as_bytes()
-    return gpd.read_file(BytesIO(data))
+    data = download_blob(storage, bucket_name, file_path)
+    with span("parse_geojson", path=file_path) as s:
+        gdf = gpd.read_file(BytesIO(data))
+        s.set(rows=len(gdf))
+    return gdf
 
-@st.cache_data(ttl=3600)
 def read_csv_from_gcs(
-    _storage_client: storage.Client, bucket_name: str, file_path: str, **kwargs: Any
+    storage: StorageBackend, bucket_name: str, file_path: str, **kwargs: Any
 ) -> pd.DataFrame:
     """
-    Read a CSV file from Google Cloud Storage into a pandas DataFrame.
-    Results are cached for 1 hour using Streamlit's caching mechanism.
+    Read a CSV file from storage into a pandas DataFrame.
+    Not cached: callers cache the layers they build from it (see src.memory_cache).
     
     Args:
-        _storage_client (storage.Client): Authenticated GCS client.
-        bucket_name (str): Name of the GCS bucket.
+        storage (StorageBackend): Backend holding the bucket.
+        bucket_name (str): Name of the bucket.
         file_path (str): Path to the CSV file in the bucket.
         **kwargs: Additional arguments passed to pd.read_csv.
         
     Returns:
         pd.DataFrame: The loaded DataFrame.
     """
-    bucket = _storage_client.bucket(bucket_name)
-    blob = bucket.blob(file_path)
-    data = blob.download_as_bytes()
-    return pd.read_csv(BytesIO(data), **kwargs)
\ No newline at end of file
+    data = download_blob(storage, bucket_name, file_path)
+    with span("parse_csv", path=file_path) as s:
+        df = pd.read_csv(BytesIO(data), **kwargs)
+        s.set(rows=len(df))
+    return df
+
+def read_geoparquet_from_gcs(
+    storage: StorageBackend, bucket_name: str, file_path: str, columns: Optional[List[str]] = None
+) -> gpd.GeoDataFrame:
+    """
+    Read a GeoParquet file from storage into a GeoDataFrame.
+    Not cached: callers cache the layers they build from it (see src.memory_cache).
+    
+    Args:
+        storage (StorageBackend): Backend holding the bucket.
+        bucket_name (str): Name of the bucket.
+        file_path (str): Path to the GeoParquet file in the bucket.
+        columns (list, optional): Columns to read; any not present in the file are skipped.
+            Only the requested column chunks are decoded, so include the geometry column.
+        
+    Returns:
+        gpd.GeoDataFrame: The loaded GeoDataFrame.
+    """
+    buffer = BytesIO(download_blob(storage, bucket_name, file_path))
+    with span("parse_geoparquet", path=file_path) as s:
+        if columns is not None:
+            available = pq.read_schema(buffer).names
+            columns = [c for c in columns if c in available]
+            buffer.seek(0)
+        gdf = gpd.read_parquet(buffer, columns=columns)
+        s.set(rows=len(gdf))
+    return gdf
+
+
+def read_parquet_from_gcs(
+    storage: StorageBackend, bucket_name: str, file_path: str
+) -> pd.DataFrame:
+    """
+    Read a (non-spatial) Parquet file from storage into a pandas DataFrame.
+    Not cached: callers cache the tables they build from it (see src.memory_cache).
+    """
+    data = download_blob(storage, bucket_name, file_path)
+    with span("parse_parquet", path=file_path) as s:
+        df = pd.read_parquet(BytesIO(data))
+        s.set(rows=len(df))
+    return df
+
+
+def upload_blob(
+    storage: StorageBackend, bucket_name: str, file_path: str, data: bytes,
+    content_type: str = "application/octet-stream"
+):
+    """Upload bytes to a blob, replacing any existing object."""
+    storage.write(bucket_name, file_path, data, content_type)
+
+
+def to_geoparquet_bytes(gdf: gpd.GeoDataFrame) -> bytes:
+    """
+    Serialize a GeoDataFrame to GeoParquet.
+    Nested GeoJSON properties (e.g. OSM tags) have no Parquet equivalent and are stored as JSON text.
+    """
+    gdf = gdf.copy()
+    for column in gdf.columns.drop(gdf.geometry.name):
+        if gdf[column].dtype == object and gdf[column].map(lambda v: isinstance(v, (dict, list))).any():
+            gdf[column] = gdf[column].map(lambda v: json.dumps(v) if isinstance(v, (dict, list)) else v)
+    buffer = BytesIO()
+    gdf.to_parquet(buffer, compression="zstd")
+    return buffer.getvalue()
+
+
+def convert_geojson_to_geoparquet(
+    storage: StorageBackend, bucket_name: str, source_path: str, target_path: Optional[str] = None
+) -> str:
+    """
+    Convert a GeoJSON blob into a GeoParquet blob in the same bucket.
+    
+    Args:
+        storage (StorageBackend): Backend holding the bucket, with write access.
+        bucket_name (str): Name of the bucket.
+        source_path (str): Path to the GeoJSON file in the bucket.
+        target_path (str, optional): Destination path. Defaults to the source path with a .parquet suffix.
+        
+    Returns:
+        str: The path the GeoParquet file was written to.
+    """
+    if target_path is None:
+        target_path = source_path.rsplit(".", 1)[0] + ".parquet"
+    gdf = gpd.read_file(BytesIO(download_blob(storage, bucket_name, source_path)))
+    upload_blob(storage, bucket_name, target_path, to_geoparquet_bytes(gdf))
+    return target_path
@@ -0,0 +1,254 @@
+"""
+Cache of rendered Folium maps.
+
+Building a page's folium.Map and serialising it is the bulk of a rerun, yet the result only
+depends on the page, the municipality, the dataset version and a few render settings. The
+pages get their map through cached_map() (see src/page_maps.py), which renders it once
+and keeps what st_folium would send to the browser in a size-capped LRU cache
+(DASHBOARD_RENDER_CACHE_MAX_MB, default 256). show_map() then draws a cached render with the
+st_folium component itself, so the browser side is unchanged.
+
+Renders can also be stored next to the build artefacts (see src/warm.py). On a miss,
+cached_map() first looks for a stored render of the same key made from the current build
+and only builds the map when there is none.
+
+Rendering mirrors st_folium() in streamlit-folium 0.25.3 (pinned in requirements.txt); check
+render_map() and show_map() against it when upgrading.
+"""
+import os
+import json
+import hashlib
+from typing import Any, Callable, Dict, List, Optional
+
+import branca
+import folium
+import folium.elements
+import folium.plugins
+import streamlit as st
+from streamlit_folium import (
+    _component_func, _get_feature_group_string, _get_header, _get_html, _get_map_string, generate_js_hash,
+    get_full_id
+)
+
+from src.gcs import download_blob, upload_blob
+from src.memory_cache import MemoryCache
+from src.storage import get_storage
+from src.timing import span
+from src.utils import BUCKET_NAME, DATA_VERSION, load_partition_manifest, partition_prefix
+
+
+class RenderedMap:
+    """A map serialised to the script, HTML and asset links the st_folium component draws."""
+
+    def __init__(
+        self, script: str, header: str, html: str, map_id: str, css_links: List[str], js_links: List[str],
+        bounds: List[List[Optional[float]]], zoom: Any
+    ):
+        self.script = script
+        self.header = header
+        self.html = html
+        self.map_id = map_id
+        self.css_links = css_links
+        self.js_links = js_links
+        self.bounds = bounds
+        self.zoom = zoom
+
+    @property
+    def size(self) -> int:
+        """Characters sent to the browser."""
+        return len(self.script) + len(self.header) + len(self.html)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return dict(vars(self))
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "RenderedMap":
+        return cls(**data)
+
+
+def _asset_elements(element):
+    if isinstance(element, branca.colormap.ColorMap):
+        yield element
+    if isinstance(element, folium.elements.JSCSSMixin):
+        yield element
+    for child in getattr(element, "_children", {}).values():
+        yield from _asset_elements(child)
+
+
+def render_map(m: folium.Map) -> RenderedMap:
+    """Serialise a map the way st_folium does before handing it to its component."""
+    m.get_root().render()
+    m.render()
+    # HTML and header first: _get_map_string alters the folium structure
+    html = _get_html(m)
+    header = _get_header(m)
+    script = _get_map_string(m)
+
+    css_links: List[str] = []
+    js_links: List[str] = []
+    for element in _asset_elements(m):
+        if isinstance(element, branca.colormap.ColorMap):
+            js_links.insert(0, "https://cdnjs.cloudflare.com/ajax/libs/d3/3.5.5/d3.min.js")
+            js_links.insert(0, "https://d3js.org/d3.v4.min.js")
+        css_links.extend(href for _, href in getattr(element, "default_css", []))
+        js_links.extend(src for _, src in getattr(element, "default_js", []))
+
+    try:
+        bounds = m.get_bounds()
+    except AttributeError:
+        bounds = [[None, None], [None, None]]
+    return RenderedMap(
+        script, header, html, get_full_id(m), list(dict.fromkeys(css_links)), list(dict.fromkeys(js_links)),
+        bounds, m.options.get("zoom")
+    )
+
+
+@st.cache_resource
+def get_render_cache() -> MemoryCache:
+    """Create the process-wide rendered map cache, capped by DASHBOARD_RENDER_CACHE_MAX_MB."""
+    max_mb = int(os.environ.get("DASHBOARD_RENDER_CACHE_MAX_MB", "256"))
+    return MemoryCache(max_mb * 1024 * 1024, name="render cache")
+
+
+def map_key(
+    page: str, municipality: str, settings: Optional[Dict[str, Any]] = None, version: str = DATA_VERSION
+) -> tuple:
+    """Render cache key of a page's map for a municipality."""
+    return page, municipality, version, tuple(sorted((settings or {}).items()))
+
+
+def _build_stamp(version: str) -> Optional[str]:
+    """When the artefacts the maps are drawn from were built (None without a build)."""
+    manifest = load_partition_manifest(version)
+    return manifest["built_at"] if manifest is not None else None
+
+
+def stored_map_path(key: tuple) -> str:
+    """Bucket path of the stored render for a map_key()."""
+    page, _, version, _ = key
+    digest = hashlib.sha256(json.dumps(key, default=str, ensure_ascii=False).encode("utf-8")).hexdigest()[:24]
+    return f"{partition_prefix(version)}/maps/{page}/{digest}.json"
+
+
+def store_map(key: tuple, rendered: RenderedMap):
+    """Upload a render for cached_map() to pick up, stamped with the build it was drawn from."""
+    record = {"key": list(key), "build": _build_stamp(key[2]), "map": rendered.to_dict()}
+    upload_blob(
+        get_storage(), BUCKET_NAME, stored_map_path(key),
+        json.dumps(record, default=str, ensure_ascii=False).encode("utf-8"), content_type="application/json"
+    )
+
+
+def load_stored_map(key: tuple) -> Optional[RenderedMap]:
+    """The stored render for a key, or None if there is none or it predates the current build."""
+    try:
+        record = json.loads(download_blob(get_storage(), BUCKET_NAME, stored_map_path(key)))
+    except FileNotFoundError:
+        return None
+    if record.get("build") != _build_stamp(key[2]):
+        return None
+    return RenderedMap.from_dict(record["map"])
+
+
+def cached_map(
+    page: str, municipality: str, build: Callable[[], folium.Map],
+    settings: Optional[Dict[str, Any]] = None, version: str = DATA_VERSION
+) -> RenderedMap:
+    """
+    Return the rendered map of a page for a municipality, calling `build` only on a cache miss.
+
+    Args:
+        page: Page name
+        municipality: Municipality the map shows
+        build: Builds the page's folium.Map, including loading its layers
+        settings: Anything else the map depends on (e.g. simplification tolerance); must be hashable values
+        version: Dataset version
+
+    Returns:
+        The rendered map, shared with other sessions (read-only)
+    """
+    key = map_key(page, municipality, settings, version)
+    source = []
+
+    def render() -> RenderedMap:
+        stored = load_stored_map(key)
+        if stored is not None:
+            source.append("stored")
+            return stored
+        source.append("miss")
+        return render_map(build())
+
+    with span("render_map", page=page) as s:
+        rendered = get_render_cache().get_or_compute(key, render, version)
+        s.set(cache=source[0] if source else "hit", chars=rendered.size)
+    return rendered
+
+
+def render_feature_group(group: folium.FeatureGroup) -> str:
+    """
+    Serialise a feature group for show_map(feature_group=...), as st_folium does with
+    feature_group_to_add. The group is drawn on a throwaway map, so any rendered map can show it.
+    """
+    return _get_feature_group_string(group, folium.Map(tiles=None))
+
+
+def _component_key(rendered: RenderedMap) -> str:
+    return generate_js_hash(rendered.script, None, False)
+
+
+def map_state(rendered: RenderedMap) -> Optional[Dict[str, Any]]:
+    """What the map last returned in this session (the returned_objects passed to show_map), or None before that."""
+    return st.session_state.get(_component_key(rendered))
+
+
+def show_map(
+    rendered: RenderedMap, height: int = 700, use_container_width: bool = False, width: Optional[int] = 500,
+    returned_objects: Optional[List[str]] = None, feature_group: Optional[str] = None
+):
+    """
+    Draw a rendered map with the st_folium component; arguments as for st_folium(), except
+    that feature_group is a group already serialised with render_feature_group(). Changing
+    the feature group between reruns replaces it on the map without reloading the map.
+
+    Returns:
+        The component's value (the map interactions listed in returned_objects)
+    """
+    if use_container_width:
+        width = None
+    defaults = {
+        "last_clicked": None,
+        "last_object_clicked": None,
+        "last_object_clicked_tooltip": None,
+        "last_object_clicked_popup": None,
+        "all_drawings": None,
+        "last_active_drawing": None,
+        "bounds": {
+            "_southWest": {"lat": rendered.bounds[0][0], "lng": rendered.bounds[0][1]},
+            "_northEast": {"lat": rendered.bounds[1][0], "lng": rendered.bounds[1][1]},
+        },
+        "zoom": rendered.zoom,
+        "last_circle_radius": None,
+        "last_circle_polygon": None,
+        "selected_layers": None,
+    }
+    if returned_objects is not None:
+        defaults = {k: v for k, v in defaults.items() if k in returned_objects}
+    return _component_func(
+        script=rendered.script,
+        header=rendered.header,
+        html=rendered.html,
+        id=rendered.map_id,
+        key=_component_key(rendered),
+        height=height,
+        width=width,
+        returned_objects=returned_objects,
+        default=defaults,
+        zoom=None,
+        center=None,
+        feature_group=feature_group,
+        return_on_hover=False,
+        layer_control=None,
+        pixelated=False,
+        css_links=rendered.css_links,
+        js_links=rendered.js_links,
+    )
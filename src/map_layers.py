@@ -0,0 +1,148 @@
+from typing import List, Optional
+
+import pandas as pd
+import geopandas as gpd
+import folium
+from folium import FeatureGroup
+
+
+# Road classes drawn by the Road Infrastructure page, bottom layer first
+ROAD_LAYERS = {
+    "Local Roads": {
+        "fclass": ["residential", "unclassified", "service"],
+        "color": "brown",
+        "weight": 1,
+        "show": True
+    },
+    "Link Roads": {
+        "fclass": ["trunk_link", "primary_link", "secondary_link", "tertiary_link"],
+        "color": "pink",
+        "weight": 1.5,
+        "show": True
+    },
+    "Tertiary Roads": {
+        "fclass": ["tertiary"],
+        "color": "blue",
+        "weight": 2,
+        "show": True
+    },
+    "Secondary Roads": {
+        "fclass": ["secondary"],
+        "color": "#f0c419",
+        "weight": 2.5,
+        "show": True
+    },
+    "Primary Roads": {
+        "fclass": ["primary"],
+        "color": "#f08a24",
+        "weight": 3.5,
+        "show": True
+    },
+    "Trunk Roads": {
+        "fclass": ["trunk"],
+        "color": "#c43b3b",
+        "weight": 4,
+        "show": True
+    },
+}
+
+
+def point_popup_columns(
+    points: gpd.GeoDataFrame, name_default: str = 'Unknown', type_default: str = 'Not specified'
+) -> gpd.GeoDataFrame:
+    """
+    Add the display columns used by point popups, computed column-wise:
+    `name` (with a fallback), `type_label` (capitalised type) and `coordinates` ("lat, lon").
+    """
+    points = points.copy()
+    points['name'] = points['name'].fillna(name_default) if 'name' in points.columns else name_default
+    if 'type' in points.columns:
+        types = points['type'].astype(object).fillna(type_default)
+    else:
+        types = pd.Series(type_default, index=points.index)
+    points['type_label'] = types.astype(str).str.capitalize()
+    # astype(str): mapping an empty float column keeps its float dtype
+    lat = points.geometry.y.map('{:.5f}'.format).astype(str)
+    lon = points.geometry.x.map('{:.5f}'.format).astype(str)
+    points['coordinates'] = '📍 ' + lat + ', ' + lon
+    return points
+
+
+def point_layer(
+    points: gpd.GeoDataFrame,
+    name: str,
+    color: str,
+    fill_color: str,
+    radius: float,
+    popup_fields: List[str],
+    tooltip_field: Optional[str] = None,
+    fill_opacity: float = 0.8,
+    show: bool = True
+) -> FeatureGroup:
+    """
+    Build a toggleable layer drawing all points as one GeoJSON FeatureCollection.
+
+    The circle style is set once for the whole collection and popups/tooltips are
+    rendered in the browser from the feature properties, so map size and build time
+    don't carry a Python marker object per point.
+
+    Args:
+        points: Point features in EPSG:4326
+        name: Layer name shown in the layer control
+        color: Circle border colour
+        fill_color: Circle fill colour
+        radius: Circle radius in pixels
+        popup_fields: Properties shown (one per line, without labels) when a point is clicked
+        tooltip_field: Property shown on hover
+        fill_opacity: Circle fill opacity
+        show: Whether the layer is initially visible
+
+    Returns:
+        FeatureGroup to add to the map (empty if there are no points)
+    """
+    layer = FeatureGroup(name=name, show=show)
+    if points.empty:
+        return layer
+
+    fields = list(dict.fromkeys(popup_fields + ([tooltip_field] if tooltip_field else [])))
+    folium.GeoJson(
+        points[fields + [points.geometry.name]],
+        marker=folium.CircleMarker(
+            radius=radius, color=color, fill=True, fill_color=fill_color, fill_opacity=fill_opacity
+        ),
+        popup=folium.GeoJsonPopup(fields=popup_fields, labels=False, max_width=250),
+        tooltip=folium.GeoJsonTooltip(fields=[tooltip_field], labels=False) if tooltip_field else None,
+    ).add_to(layer)
+    return layer
+
+
+def line_layer(
+    lines: gpd.GeoDataFrame,
+    color: str,
+    weight: float,
+    popup_fields: Optional[List[str]] = None,
+    opacity: float = 0.85,
+    max_width: int = 150
+) -> folium.GeoJson:
+    """
+    Build one GeoJSON collection of lines sharing a style, with popups rendered in
+    the browser from the feature properties (shown without labels).
+
+    Args:
+        lines: Line features in EPSG:4326
+        color: Line colour
+        weight: Line width in pixels
+        popup_fields: Properties shown when a line is clicked
+        opacity: Line opacity
+        max_width: Maximum popup width in pixels
+
+    Returns:
+        GeoJson layer to add to a map or feature group
+    """
+    popup_fields = popup_fields or []
+    style = {'color': color, 'weight': weight, 'opacity': opacity}
+    return folium.GeoJson(
+        lines[popup_fields + [lines.geometry.name]],
+        style_function=lambda feature: style,
+        popup=folium.GeoJsonPopup(fields=popup_fields, labels=False, max_width=max_width) if popup_fields else None,
+    )
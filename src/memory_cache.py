@@ -0,0 +1,231 @@
+"""
+In-process cache for the layers and tables the pages share.
+
+Loaders decorated with @cached keep one copy of each result per process, shared by every
+session and rerun: a hit hands back the same object, so callers must treat it as read-only
+(copy, or use .copy(deep=False) before adding columns). The cache is bounded by
+DASHBOARD_MEMORY_CACHE_MAX_MB (default 4096); past it the least recently used results are
+dropped and recomputed on their next use.
+"""
+import os
+import sys
+import inspect
+import logging
+import functools
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import shapely
+import streamlit as st
+
+
+# Rough per-geometry overhead of a GEOS object on top of its coordinates
+GEOMETRY_OVERHEAD_BYTES = 100
+
+
+def _geometry_bytes(geometries: np.ndarray) -> int:
+    geometries = np.asarray(geometries, dtype=object)
+    return int(shapely.get_num_coordinates(geometries).sum()) * 16 + len(geometries) * GEOMETRY_OVERHEAD_BYTES
+
+
+def estimate_size(value: Any, _seen: Optional[set] = None) -> int:
+    """
+    Approximate memory held by a cached value in bytes: frame columns including string
+    contents and geometry coordinates, arrays, containers and the attributes of plain objects.
+    Objects reachable more than once are counted once.
+    """
+    _seen = set() if _seen is None else _seen
+    if id(value) in _seen:
+        return 0
+    _seen.add(id(value))
+    if isinstance(value, pd.DataFrame):
+        size = int(value.memory_usage(deep=True).sum())
+        for column in value.columns:
+            if value[column].dtype.name == "geometry":
+                size += _geometry_bytes(value[column].values)
+        return size
+    if isinstance(value, pd.Series):
+        size = int(value.memory_usage(deep=True))
+        return size + (_geometry_bytes(value.values) if value.dtype.name == "geometry" else 0)
+    if isinstance(value, np.ndarray):
+        if value.dtype == object and value.size and isinstance(value.flat[0], shapely.Geometry):
+            return value.nbytes + _geometry_bytes(value)
+        return value.nbytes
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(
+            estimate_size(k, _seen) + estimate_size(v, _seen) for k, v in value.items()
+        )
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(estimate_size(v, _seen) for v in value)
+    if hasattr(value, "__dict__") and not isinstance(value, type):
+        return sys.getsizeof(value) + sum(estimate_size(v, _seen) for v in vars(value).values())
+    return sys.getsizeof(value)
+
+
+logger = logging.getLogger("dashboard.memory_cache")
+
+
+class MemoryCache:
+    """
+    Size-capped LRU cache of computed values, shared across threads.
+
+    Entries are keyed by any hashable and tagged with the dataset version they were computed
+    for, so one version can be dropped with invalidate(). Each key is computed once: a thread
+    asking for a key that another thread is computing waits for that result rather than
+    starting its own, while other keys are computed concurrently.
+
+    A value larger than the whole cap is not stored: it is logged as a warning and counted
+    as `oversized` in stats(), and recomputed on its next use.
+    """
+
+    def __init__(self, max_bytes: int, name: str = "memory cache"):
+        self.max_bytes = max_bytes
+        self.name = name
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.oversized = 0
+        self._entries: "OrderedDict[Hashable, Tuple[Any, int, Optional[str]]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        # Per-key compute locks and the number of threads holding or waiting for each, so a
+        # key's lock is dropped once its last waiter is done
+        self._key_locks: Dict[Hashable, threading.Lock] = {}
+        self._key_waiters: Dict[Hashable, int] = {}
+        # Values too large to store, handed to the threads already waiting for their key
+        self._in_flight: Dict[Hashable, Any] = {}
+
+    def _lookup(self, key: Hashable) -> Tuple[bool, Any]:
+        # Caller holds self._lock
+        entry = self._entries.get(key)
+        if entry is None:
+            return False, None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return True, entry[0]
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any], version: Optional[str] = None) -> Any:
+        """
+        Return the cached value for `key`, computing and storing it on a miss.
+
+        Args:
+            key: Hashable identifying the value
+            compute: Produces the value; exceptions propagate and nothing is stored
+            version: Dataset version the value belongs to (see invalidate)
+
+        Returns:
+            The value, the same object on every hit
+        """
+        with self._lock:
+            found, value = self._lookup(key)
+            if found:
+                return value
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+            self._key_waiters[key] = self._key_waiters.get(key, 0) + 1
+        try:
+            with key_lock:
+                with self._lock:
+                    found, value = self._lookup(key)
+                    if found:
+                        return value
+                    if key in self._in_flight:
+                        return self._in_flight[key]
+                    self.misses += 1
+                value = compute()
+                if not self.put(key, value, version):
+                    with self._lock:
+                        self._in_flight[key] = value
+            return value
+        finally:
+            with self._lock:
+                self._key_waiters[key] -= 1
+                if not self._key_waiters[key]:
+                    del self._key_waiters[key]
+                    del self._key_locks[key]
+                    self._in_flight.pop(key, None)
+
+    def put(self, key: Hashable, value: Any, version: Optional[str] = None) -> bool:
+        """
+        Store a value, evicting least recently used entries to stay under the cap.
+
+        Returns:
+            Whether the value was stored (False if it alone exceeds the cap)
+        """
+        size = estimate_size(value)
+        if size > self.max_bytes:
+            with self._lock:
+                self.oversized += 1
+            logger.warning(
+                "%s: not keeping %r, its %.0f MiB exceed the whole %.0f MiB cap; it is recomputed on every use",
+                self.name, key, size / 2**20, self.max_bytes / 2**20,
+            )
+            return False
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous[1]
+            self._entries[key] = (value, size, version)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, evicted_size, _) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+        return True
+
+    def invalidate(self, version: Optional[str] = None) -> int:
+        """
+        Drop the entries computed for a dataset version, or every entry if version is None.
+
+        Returns:
+            The number of entries dropped
+        """
+        with self._lock:
+            keys = [key for key, entry in self._entries.items() if version is None or entry[2] == version]
+            for key in keys:
+                self._bytes -= self._entries.pop(key)[1]
+            return len(keys)
+
+    def stats(self) -> Dict[str, int]:
+        """Return hit/miss/eviction/oversized counters and the current entry count and size."""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "oversized": self.oversized,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+
+@st.cache_resource
+def get_memory_cache() -> MemoryCache:
+    """Create the process-wide memory cache, capped by DASHBOARD_MEMORY_CACHE_MAX_MB."""
+    max_mb = int(os.environ.get("DASHBOARD_MEMORY_CACHE_MAX_MB", "4096"))
+    return MemoryCache(max_mb * 1024 * 1024)
+
+
+def cached(func: Callable) -> Callable:
+    """
+    Cache a loader's results in the process-wide MemoryCache.
+
+    The key is the function and its bound arguments with defaults filled in, so
+    `load(layer)` and `load(layer, DATA_VERSION)` share an entry. Arguments must be
+    hashable; a `version` argument tags the entry with that dataset version.
+    """
+    signature = inspect.signature(func)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        bound = signature.bind(*args, **kwargs)
+        bound.apply_defaults()
+        key = (func.__module__, func.__qualname__, tuple(bound.arguments.items()))
+        return get_memory_cache().get_or_compute(
+            key, lambda: func(*bound.args, **bound.kwargs), bound.arguments.get("version")
+        )
+
+    return wrapper
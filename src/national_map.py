@@ -0,0 +1,136 @@
+"""
+National choropleth of each infrastructure page: every municipality coloured by one metric.
+
+The map is drawn from the page's aggregate table (src/aggregates.py) and the municipality
+polygons dissolved and simplified once per dataset version, so no infrastructure geometry is
+loaded or sent to the browser. Metrics are shown per km² so municipalities of different
+sizes compare; the tooltip also gives the absolute figure. Each metric's map is rendered once
+and kept in the render cache (src/map_cache.py).
+"""
+from functools import partial
+from typing import Dict, Tuple
+
+import numpy as np
+import geopandas as gpd
+import shapely
+import folium
+import branca.colormap
+import streamlit as st
+
+from src.aggregates import load_aggregates
+from src.map_cache import RenderedMap, cached_map, show_map
+from src.memory_cache import cached
+from src.timing import span
+from src.utils import DATA_VERSION, LENGTH_CRS, load_poly
+
+
+# Tolerance (degrees, ~500 m) the national outlines are simplified with; details below it
+# are invisible at the zoom the whole country is shown at
+NATIONAL_SIMPLIFY_TOLERANCE = 0.005
+# Bump when national_map_figure() changes what it draws
+NATIONAL_MAP_VERSION = 1
+# Metrics of each page: label -> (aggregate table column, unit of the absolute figure)
+NATIONAL_METRICS: Dict[str, Dict[str, Tuple[str, str]]] = {
+    "roads": {
+        "All roads": ("total_km", "km"),
+        "Trunk roads": ("trunk", "km"),
+        "Primary roads": ("primary", "km"),
+        "Secondary roads": ("secondary", "km"),
+        "Tertiary roads": ("tertiary", "km"),
+        "Link roads": ("link", "km"),
+        "Local roads": ("local", "km"),
+    },
+    "rails": {
+        "Railway lines": ("length_km", "km"),
+        "Train stations": ("stations", "stations"),
+    },
+    "schools": {
+        "Schools": ("school", "schools"),
+        "Universities": ("university", "universities"),
+    },
+    "hospitals": {
+        "Hospitals": ("hospital", "hospitals"),
+        "Clinics": ("clinic", "clinics"),
+    },
+}
+
+
+@cached
+def load_national_shapes(version: str = DATA_VERSION) -> gpd.GeoDataFrame:
+    """
+    One simplified WGS84 polygon per municipality with its area in km² (cached per dataset
+    version), indexed by municipality name.
+    """
+    poly = load_poly(version)
+    with span("national_shapes", rows=len(poly)):
+        groups = poly.groupby("Municipality", observed=True).indices
+        geometry = poly.geometry.values
+        shapes = gpd.GeoDataFrame(
+            {"Municipality": list(groups)},
+            geometry=[shapely.union_all(geometry[positions]) for positions in groups.values()],
+            crs=poly.crs,
+        ).to_crs("EPSG:4326")
+        shapes["area_km2"] = shapes.geometry.to_crs(LENGTH_CRS).area.to_numpy() / 1e6
+        shapes["geometry"] = shapes.geometry.simplify(NATIONAL_SIMPLIFY_TOLERANCE, preserve_topology=True)
+        return shapes.set_index("Municipality", drop=False)
+
+
+def national_map_figure(page: str, metric: str, version: str = DATA_VERSION) -> folium.Map:
+    """Build the choropleth of one of a page's NATIONAL_METRICS."""
+    column, unit = NATIONAL_METRICS[page][metric]
+    shapes = load_national_shapes(version).copy()
+    by_municipality = load_aggregates(page, version).by_municipality
+    values = by_municipality[column].reindex(shapes.index, fill_value=0) if column in by_municipality else 0
+    shapes["value"] = np.round(np.asarray(values, dtype="float64"), 2)
+    shapes["density"] = np.round(shapes["value"] / shapes["area_km2"], 4)
+    shapes["area_km2"] = shapes["area_km2"].round(1)
+
+    # Quantile steps, so a few dense cities do not wash out every other municipality
+    # (merged where they coincide, e.g. when most municipalities have none)
+    densities = shapes["density"].to_numpy()
+    breaks = np.unique(np.quantile(densities, np.linspace(0, 1, 7)))
+    if len(breaks) < 2:
+        breaks = np.array([breaks[0], breaks[0] + 1])
+    steps = len(breaks) - 1
+    positions = np.linspace(0, 1, steps) if steps > 1 else [0.5]
+    colors = [branca.colormap.linear.YlOrRd_09.rgb_hex_str(x) for x in positions]
+    colormap = branca.colormap.StepColormap(colors, index=breaks.tolist(), vmin=breaks[0], vmax=breaks[-1])
+    colormap.caption = f"{metric}: {unit} per km²"
+    shapes["fill"] = [colormap(density) for density in densities]
+
+    minx, miny, maxx, maxy = shapes.total_bounds
+    m = folium.Map(location=[(miny + maxy) / 2, (minx + maxx) / 2], zoom_start=7, tiles='CartoDB positron')
+    folium.GeoJson(
+        shapes[["Municipality", "value", "density", "area_km2", "fill", "geometry"]],
+        style_function=lambda feature: {
+            'fillColor': feature['properties']['fill'],
+            'color': '#333333',
+            'weight': 0.5,
+            'fillOpacity': 0.75
+        },
+        highlight_function=lambda feature: {'weight': 2, 'fillOpacity': 0.9},
+        tooltip=folium.GeoJsonTooltip(
+            fields=['Municipality', 'value', 'density', 'area_km2'],
+            aliases=['Municipality:', f'{metric} ({unit}):', f'{unit} per km²:', 'Area (km²):'],
+            localize=True
+        )
+    ).add_to(m)
+    colormap.add_to(m)
+    m.fit_bounds([[miny, minx], [maxy, maxx]])
+    return m
+
+
+def national_map(page: str, metric: str, version: str = DATA_VERSION) -> RenderedMap:
+    """The rendered choropleth of a page's metric, built only on a cache miss."""
+    settings = {"simplify": NATIONAL_SIMPLIFY_TOLERANCE, "map_version": NATIONAL_MAP_VERSION}
+    return cached_map(f"{page}-national", metric, partial(national_map_figure, page, metric, version), settings, version)
+
+
+@st.fragment
+def national_map_section(page: str, height: int = 600):
+    """
+    The page's national map with its metric picker. A fragment, so picking another metric
+    redraws only the national map.
+    """
+    metric = st.selectbox("Colour municipalities by", list(NATIONAL_METRICS[page]), key=f"national_metric_{page}")
+    show_map(national_map(page, metric), height=height, use_container_width=True, returned_objects=[])
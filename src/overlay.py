@@ -0,0 +1,114 @@
+"""
+Clip line layers to municipality polygons.
+
+Kept free of Streamlit and GCS imports so pool workers can load it cheaply.
+"""
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional, Tuple
+
+import numpy as np
+import shapely
+import geopandas as gpd
+
+
+# Chunks per worker: enough to balance dense and sparse areas without paying much per-task overhead
+CHUNKS_PER_WORKER = 4
+
+# Municipality polygons and their STRtree, set once per worker process by _init_worker
+_polygons: Optional[np.ndarray] = None
+_tree: Optional[shapely.STRtree] = None
+
+
+def _polygon_tree(polygons: np.ndarray) -> shapely.STRtree:
+    shapely.prepare(polygons)
+    return shapely.STRtree(polygons)
+
+
+def _init_worker(polygons: np.ndarray):
+    global _polygons, _tree
+    _polygons = polygons
+    _tree = _polygon_tree(polygons)
+
+
+def _clip_in_worker(lines: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    return _clip_chunk(lines, _tree, _polygons)
+
+
+def _clip_chunk(
+    lines: np.ndarray, tree: shapely.STRtree, polygons: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Clip one chunk of line geometries to the polygons indexed by `tree`.
+
+    Returns:
+        (line positions within the chunk, polygon positions, clipped geometries), one entry per
+        line/polygon pair with a piece of positive length, ordered by line then polygon
+    """
+    line_idx, poly_idx = tree.query(lines, predicate='intersects')
+    order = np.lexsort((poly_idx, line_idx))
+    line_idx, poly_idx = line_idx[order], poly_idx[order]
+    polygons = polygons[poly_idx]
+    pieces = lines[line_idx]
+    # Lines entirely inside a municipality are kept as they are; only border crossings are cut
+    crossing = ~shapely.contains(polygons, pieces)
+    pieces[crossing] = shapely.intersection(pieces[crossing], polygons[crossing])
+    # A stretch running along a shared border lies in both polygons: keep it in the first one
+    # only, by taking from each later piece of a line what its earlier pieces already cover
+    taken = {}
+    for position in np.flatnonzero(line_idx[1:] == line_idx[:-1]) + 1:
+        line = line_idx[position]
+        covered = taken.get(line, pieces[position - 1])
+        pieces[position] = shapely.difference(pieces[position], covered)
+        taken[line] = shapely.union(covered, pieces[position])
+    keep = shapely.length(pieces) > 0
+    return line_idx[keep], poly_idx[keep], pieces[keep]
+
+
+def _dissolve(poly: gpd.GeoDataFrame) -> Tuple[np.ndarray, np.ndarray]:
+    """Municipality names and one polygon per municipality, merging municipalities made of several rows."""
+    groups = poly.groupby('Municipality', observed=True).indices
+    geometry = np.asarray(poly.geometry)
+    names = np.array(list(groups), dtype=object)
+    polygons = np.array([shapely.union_all(geometry[positions]) for positions in groups.values()], dtype=object)
+    return names, polygons
+
+
+def clip_lines(lines: gpd.GeoDataFrame, poly: gpd.GeoDataFrame, workers: int = 1) -> gpd.GeoDataFrame:
+    """
+    Split lines at municipality borders, keeping each piece once under the municipality it lies in.
+    A stretch running exactly along a border goes to the first municipality by name, so the
+    municipal lengths add up to the layer's.
+
+    The layer is cut into spatially compact chunks (in Hilbert curve order) that are clipped in
+    parallel on a process pool when `workers` > 1.
+
+    Args:
+        lines: Line features in any CRS
+        poly: Municipality polygons with a `Municipality` column
+        workers: Number of worker processes (1 clips in this process)
+
+    Returns:
+        One row per line and municipality it enters, in the municipality CRS, with the line's
+        attributes and index label, its clipped geometry and a `Municipality` column
+    """
+    lines = lines.to_crs(poly.crs)
+    lines = lines[~(lines.geometry.isna() | lines.geometry.is_empty)]
+    names, polygons = _dissolve(poly)
+
+    geoms = np.asarray(lines.geometry)
+    if workers > 1 and len(geoms) > 0:
+        order = np.argsort(lines.geometry.hilbert_distance().to_numpy(), kind='stable')
+        chunks = [c for c in np.array_split(order, workers * CHUNKS_PER_WORKER) if len(c)]
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(polygons,)) as pool:
+            results = list(pool.map(_clip_in_worker, [geoms[chunk] for chunk in chunks]))
+        line_idx = np.concatenate([chunk[idx] for chunk, (idx, _, _) in zip(chunks, results)])
+        poly_idx = np.concatenate([idx for _, idx, _ in results])
+        pieces = np.concatenate([p for _, _, p in results])
+    else:
+        # A tree of its own rather than the worker globals: layers may be clipped on several threads at once
+        line_idx, poly_idx, pieces = _clip_chunk(geoms, _polygon_tree(polygons), polygons)
+
+    order = np.lexsort((poly_idx, line_idx))
+    clipped = lines.iloc[line_idx[order]].assign(Municipality=names[poly_idx[order]])
+    clipped[clipped.geometry.name] = pieces[order]
+    return clipped
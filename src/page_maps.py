@@ -0,0 +1,505 @@
+"""
+The Folium map of each infrastructure page, built for one municipality.
+
+The builders only depend on the municipality, so a map can be rendered outside a page run
+(see src/warm.py); the pages draw them through page_map(), which caches the render.
+
+The pages call draw_map(), which can draw the deck.gl version of the map instead (see
+src/deck_maps.py): set DASHBOARD_MAP_BACKEND=deck for every page, or
+DASHBOARD_MAP_BACKEND_<PAGE> (e.g. DASHBOARD_MAP_BACKEND_ROADS=deck) for one.
+"""
+import os
+from functools import partial
+from typing import Any, Dict
+
+import numpy as np
+import folium
+import streamlit as st
+from folium import FeatureGroup
+
+from src.deck_maps import deck_map, national_roads_deck
+from src.map_cache import RenderedMap, cached_map, show_map
+from src.map_layers import ROAD_LAYERS, line_layer, point_layer, point_popup_columns
+from src.timing import mark
+from src.utils import DATA_VERSION, SIMPLIFY_TOLERANCE, load_municipality_layer, municipality_shape
+
+
+def roads_map(municipality: str) -> folium.Map:
+    """Build the Road Infrastructure page's map of one municipality."""
+    shape = municipality_shape(municipality)
+    # Render-ready roads: already in WGS84, simplified and with Yes/No bridge/tunnel labels
+    roads_wgs84 = load_municipality_layer("roads", municipality)
+
+    if shape is None:
+        raise ValueError("Cannot create map: polygon data is empty after filtering.")
+
+    # Boundary already in WGS84 for Folium
+    poly_wgs84 = shape.boundary
+
+    # Map centred on the municipality's bounding box
+    center_lat, center_lon = shape.center
+
+    # Create base map
+    m = folium.Map(
+        location=[center_lat, center_lon],
+        zoom_start=12,
+        tiles='CartoDB positron'
+    )
+
+    # Style function factory for roads (handles bridge/tunnel coloring)
+    def make_style_function(default_color, weight):
+        def style_function(feature):
+            props = feature.get('properties', {})
+            is_bridge = props.get('bridge', 'No') == 'Yes'
+            is_tunnel = props.get('tunnel', 'No') == 'Yes'
+
+            if is_bridge:
+                color = '#2a9d8f'
+            elif is_tunnel:
+                color = '#6c757d'
+            else:
+                color = default_color
+
+            return {
+                'color': color,
+                'weight': weight,
+                'opacity': 0.85
+            }
+        return style_function
+
+    # --- Layer 1: District Boundaries ---
+    boundaries_layer = FeatureGroup(name='District Boundaries', show=True)
+    folium.GeoJson(
+        poly_wgs84,
+        style_function=lambda x: {
+            'fillColor': 'transparent',
+            'color': '#333333',
+            'weight': 1,
+            'fillOpacity': 0
+        }
+    ).add_to(boundaries_layer)
+    boundaries_layer.add_to(m)
+
+    # --- Layer 2: Roads by class (using GeoJson for performance) ---
+    for layer_name, config in ROAD_LAYERS.items():
+        # Filter roads for this layer
+        layer_roads = roads_wgs84[roads_wgs84['fclass'].isin(config['fclass'])]
+
+        if layer_roads.empty:
+            continue
+
+        # Create feature group
+        layer = FeatureGroup(name=layer_name, show=config['show'])
+
+        # Add GeoJson with style function and popup
+        folium.GeoJson(
+            layer_roads,
+            style_function=make_style_function(config['color'], config['weight']),
+            tooltip=folium.GeoJsonTooltip(
+                fields=['fclass', 'bridge', 'tunnel'],
+                aliases=['Class:', 'Bridge:', 'Tunnel:'],
+                localize=True
+            ),
+            popup=folium.GeoJsonPopup(
+                fields=['fclass', 'bridge', 'tunnel'],
+                aliases=['<b>Class</b>', '<b>Bridge</b>', '<b>Tunnel</b>'],
+                localize=True
+            )
+        ).add_to(layer)
+
+        layer.add_to(m)
+
+    # Add layer control
+    folium.LayerControl(collapsed=False).add_to(m)
+
+    # --- Custom Legend ---
+    legend_html = '''
+    <div style="position: fixed; top: 30px; left: 10%; transform: translateX(-50%); z-index: 9999;
+                background: rgba(255,255,255,0.95); padding: 12px 16px; border-radius: 8px;
+                box-shadow: 0 2px 8px rgba(0,0,0,0.25); font-family: Arial, sans-serif; font-size: 12px;">
+        <h4 style="margin: 0 0 10px 0; color: #333; border-bottom: 1px solid #ddd; padding-bottom: 6px;">Legend</h4>
+        <div style="display: flex; align-items: center; margin: 5px 0;">
+            <span style="display: inline-block; width: 30px; height: 4px; background: #c43b3b; margin-right: 8px;"></span>Trunk
+        </div>
+        <div style="display: flex; align-items: center; margin: 5px 0;">
+            <span style="display: inline-block; width: 30px; height: 3.5px; background: #f08a24; margin-right: 8px;"></span>Primary
+        </div>
+        <div style="display: flex; align-items: center; margin: 5px 0;">
+            <span style="display: inline-block; width: 30px; height: 2.5px; background: #f0c419; margin-right: 8px;"></span>Secondary
+        </div>
+        <div style="display: flex; align-items: center; margin: 5px 0;">
+            <span style="display: inline-block; width: 30px; height: 2px; background: blue; margin-right: 8px;"></span>Tertiary
+        </div>
+        <div style="display: flex; align-items: center; margin: 5px 0;">
+            <span style="display: inline-block; width: 30px; height: 1.5px; background: pink; margin-right: 8px;"></span>Links
+        </div>
+        <div style="display: flex; align-items: center; margin: 5px 0;">
+            <span style="display: inline-block; width: 30px; height: 1px; background: brown; margin-right: 8px;"></span>Local
+        </div>
+        <hr style="margin: 8px 0; border: none; border-top: 1px solid #ddd;">
+        <div style="display: flex; align-items: center; margin: 5px 0;">
+            <span style="display: inline-block; width: 30px; height: 3px; background: #2a9d8f; margin-right: 8px;"></span>🌉 Bridge
+        </div>
+        <div style="display: flex; align-items: center; margin: 5px 0;">
+            <span style="display: inline-block; width: 30px; height: 3px; background: #6c757d; margin-right: 8px;"></span>🚇 Tunnel
+        </div>
+        <div style="display: flex; align-items: center; margin: 5px 0;">
+            <span style="display: inline-block; width: 30px; height: 3px; background: black; margin-right: 8px;"></span>District Boundaries
+        </div>
+    </div>
+    '''
+    m.get_root().html.add_child(folium.Element(legend_html))
+
+    # Add title
+    title_html = '''
+    <div style="position: fixed; top: 10px; left: 50%; transform: translateX(-50%); z-index: 9999;
+                background: rgba(255,255,255,0.9); padding: 10px 20px; border-radius: 8px;
+                box-shadow: 0 2px 6px rgba(0,0,0,0.2); font-family: Arial, sans-serif;">
+        <h3 style="margin: 0; color: #333;">Serbia – National Road Network via OSM</h3>
+        <p style="margin: 5px 0 0 0; font-size: 12px; color: #666;">Toggle layers • Click roads for details</p>
+    </div>
+    '''
+    m.get_root().html.add_child(folium.Element(title_html))
+    return m
+
+
+def rails_map(municipality: str) -> folium.Map:
+    """Build the Rail Infrastructure page's map of one municipality."""
+    shape = municipality_shape(municipality)
+    # Render-ready layers: already in WGS84 with Yes/No bridge/tunnel labels
+    rails_wgs84 = load_municipality_layer("rails", municipality)
+    stations_wgs84 = load_municipality_layer("stations", municipality)
+
+    if shape is None:
+        raise ValueError("Cannot create map: polygon data is empty after filtering.")
+
+    # Boundary already in WGS84 (lat/lon) for Folium
+    poly_wgs84 = shape.boundary
+
+    # Map centred on the municipality's bounding box
+    center_lat, center_lon = shape.center
+
+    # Create base map
+    m = folium.Map(
+        location=[center_lat, center_lon],
+        zoom_start=12,
+        tiles='CartoDB positron'
+    )
+
+    # --- Layer 1: District Boundaries ---
+    boundaries_layer = FeatureGroup(name='District Boundaries', show=True)
+    folium.GeoJson(
+        poly_wgs84,
+        style_function=lambda x: {
+            'fillColor': 'transparent',
+            'color': '#333333',
+            'weight': 1,
+            'fillOpacity': 0
+        },
+        tooltip=folium.GeoJsonTooltip(fields=['Municipality'] if 'Municipality' in poly_wgs84.columns else [])
+    ).add_to(boundaries_layer)
+    boundaries_layer.add_to(m)
+
+    # --- Layer 2: Railway Lines (one GeoJSON per track type) ---
+    # Color by type: teal=bridge, gray=tunnel, red=regular
+    track_colors = {'regular': '#e63946', 'bridge': '#2a9d8f', 'tunnel': '#6c757d'}
+    is_bridge = rails_wgs84['bridge'] == 'Yes'
+    is_tunnel = rails_wgs84['tunnel'] == 'Yes'
+    track_class = np.select([is_bridge, is_tunnel], ['bridge', 'tunnel'], 'regular')
+    rails_wgs84['track'] = np.select(
+        [is_bridge & is_tunnel, is_bridge, is_tunnel],
+        ["🌉 <b>Bridge</b><br>🚇 <b>Tunnel</b>", "🌉 <b>Bridge</b>", "🚇 <b>Tunnel</b>"],
+        "🛤️ Regular track"
+    )
+
+    railways_layer = FeatureGroup(name='Railway Lines', show=True)
+    for track, color in track_colors.items():
+        track_rails = rails_wgs84[track_class == track]
+        if not track_rails.empty:
+            line_layer(track_rails, color, weight=3, opacity=0.9, popup_fields=['track']).add_to(railways_layer)
+    railways_layer.add_to(m)
+
+    # --- Layer 3: Train Stations ---
+    stations_wgs84 = point_popup_columns(stations_wgs84, name_default='Unknown Station')
+    point_layer(
+        stations_wgs84, 'Train Stations',
+        color='#1d3557', fill_color='#457b9d', radius=3, fill_opacity=0.9,
+        popup_fields=['name'], tooltip_field='name'
+    ).add_to(m)
+
+    # Add layer control (toggle layers on/off)
+    folium.LayerControl(collapsed=False).add_to(m)
+
+    # --- Custom Legend ---
+    legend_html = '''
+    <div style="position: fixed; top: 30px; left: 50px; z-index: 9999;
+                background: rgba(255,255,255,0.95); padding: 12px 16px; border-radius: 8px;
+                box-shadow: 0 2px 8px rgba(0,0,0,0.25); font-family: Arial, sans-serif; font-size: 12px;">
+        <h4 style="margin: 0 0 10px 0; color: #333; border-bottom: 1px solid #ddd; padding-bottom: 6px;">Map Legend</h4>
+        <div style="display: flex; align-items: center; margin: 5px 0;">
+            <span style="display: inline-block; width: 30px; height: 3px; background: #e63946; margin-right: 8px;"></span>Railway Line
+        </div>
+        <div style="display: flex; align-items: center; margin: 5px 0;">
+            <span style="display: inline-block; width: 12px; height: 12px; background: #457b9d; border: 2px solid #1d3557; border-radius: 50%; margin-right: 8px; margin-left: 9px;"></span>Train Station
+        </div>
+        <div style="display: flex; align-items: center; margin: 5px 0;">
+            <span style="display: inline-block; width: 30px; height: 3px; background: #333333; margin-right: 8px;"></span>District Boundary
+        </div>
+        <hr style="margin: 8px 0; border: none; border-top: 1px solid #ddd;">
+        <div style="display: flex; align-items: center; margin: 5px 0;">
+            <span style="display: inline-block; width: 30px; height: 3px; background: #2a9d8f; margin-right: 8px;"></span>🌉 Bridge
+        </div>
+        <div style="display: flex; align-items: center; margin: 5px 0;">
+            <span style="display: inline-block; width: 30px; height: 3px; background: #6c757d; margin-right: 8px;"></span>🚇 Tunnel
+        </div>
+    </div>
+    '''
+    m.get_root().html.add_child(folium.Element(legend_html))
+
+    # Add title
+    title_html = f'''
+    <div style="position: fixed; top: 10px; left: 50%; transform: translateX(-50%); z-index: 9999;
+                background: rgba(255,255,255,0.9); padding: 10px 20px; border-radius: 8px;
+                box-shadow: 0 2px 6px rgba(0,0,0,0.2); font-family: Arial, sans-serif;">
+        <h3 style="margin: 0; color: #1d3557;">{municipality} – Railway Network via OSM</h3>
+        <p style="margin: 5px 0 0 0; font-size: 12px; color: #666;">Toggle layers using the control on the right</p>
+    </div>
+    '''
+    m.get_root().html.add_child(folium.Element(title_html))
+    return m
+
+
+def schools_map(municipality: str) -> folium.Map:
+    """Build the Schools & Universities page's map of one municipality."""
+    shape = municipality_shape(municipality)
+
+    # Render-ready schools, already in WGS84
+    schools_wgs84 = load_municipality_layer("schools", municipality)
+
+    if shape is None:
+        raise ValueError("Cannot create map: polygon data is empty after filtering.")
+
+    # Boundary already in WGS84 (lat/lon) for Folium
+    poly_wgs84 = shape.boundary
+
+    # Map centred on the municipality's bounding box
+    center_lat, center_lon = shape.center
+
+    # Create base map
+    m = folium.Map(
+        location=[center_lat, center_lon],
+        zoom_start=12,
+        tiles='CartoDB positron'
+    )
+
+    # --- Layer 1: District Boundaries ---
+    boundaries_layer = FeatureGroup(name='District Boundaries', show=True)
+    folium.GeoJson(
+        poly_wgs84,
+        style_function=lambda x: {
+            'fillColor': 'transparent',
+            'color': '#333333',
+            'weight': 1,
+            'fillOpacity': 0
+        },
+        tooltip=folium.GeoJsonTooltip(fields=['Municipality'] if 'Municipality' in poly_wgs84.columns else [])
+    ).add_to(boundaries_layer)
+    boundaries_layer.add_to(m)
+
+    # --- Layer 2: Schools (one GeoJSON collection per category) ---
+    schools_wgs84 = point_popup_columns(schools_wgs84)
+    is_university = schools_wgs84['type_label'].str.contains('university', case=False)
+
+    point_layer(
+        schools_wgs84[~is_university], 'Schools',
+        color='#1d3557', fill_color='#e63946', radius=7,  # Red for schools
+        popup_fields=['name', 'type_label', 'coordinates'], tooltip_field='type_label'
+    ).add_to(m)
+    point_layer(
+        schools_wgs84[is_university], 'Universities',
+        color='#6c3483', fill_color='#9b59b6', radius=7,  # Purple for universities
+        popup_fields=['name', 'type_label', 'coordinates'], tooltip_field='type_label'
+    ).add_to(m)
+
+    # Add layer control (toggle layers on/off)
+    folium.LayerControl(collapsed=False).add_to(m)
+
+    # --- Custom Legend ---
+    legend_html = '''
+    <div style="position: fixed; top: 30px; left: 50px; z-index: 9999;
+                background: rgba(255,255,255,0.95); padding: 12px 16px; border-radius: 8px;
+                box-shadow: 0 2px 8px rgba(0,0,0,0.25); font-family: Arial, sans-serif; font-size: 12px;">
+        <h4 style="margin: 0 0 10px 0; color: #333; border-bottom: 1px solid #ddd; padding-bottom: 6px;">Map Legend</h4>
+        <div style="display: flex; align-items: center; margin: 5px 0;">
+            <span style="display: inline-block; width: 12px; height: 12px; background: #e63946; border: 2px solid #1d3557; border-radius: 50%; margin-right: 8px; margin-left: 9px;"></span>School
+        </div>
+        <div style="display: flex; align-items: center; margin: 5px 0;">
+            <span style="display: inline-block; width: 14px; height: 14px; background: #9b59b6; border: 2px solid #6c3483; border-radius: 50%; margin-right: 8px; margin-left: 8px;"></span>University
+        </div>
+        <div style="display: flex; align-items: center; margin: 5px 0;">
+            <span style="display: inline-block; width: 30px; height: 3px; background: #333333; margin-right: 8px;"></span>District Boundary
+        </div>
+    </div>
+    '''
+    m.get_root().html.add_child(folium.Element(legend_html))
+
+    # Add title
+    title_html = f'''
+    <div style="position: fixed; top: 10px; left: 50%; transform: translateX(-50%); z-index: 9999;
+                background: rgba(255,255,255,0.9); padding: 10px 20px; border-radius: 8px;
+                box-shadow: 0 2px 6px rgba(0,0,0,0.2); font-family: Arial, sans-serif;">
+        <h3 style="margin: 0; color: #1d3557;">{municipality} – Schools & Universities</h3>
+        <p style="margin: 5px 0 0 0; font-size: 12px; color: #666;">Toggle layers using the control on the right</p>
+    </div>
+    '''
+    m.get_root().html.add_child(folium.Element(title_html))
+    return m
+
+
+def hospitals_map(municipality: str) -> folium.Map:
+    """Build the Healthcare Facilities page's map of one municipality."""
+    shape = municipality_shape(municipality)
+    # Render-ready facilities, already in WGS84
+    hospitals_wgs84 = load_municipality_layer("hospitals", municipality)
+
+    if shape is None:
+        raise ValueError("Cannot create map: polygon data is empty after filtering.")
+
+    # Boundary already in WGS84 (lat/lon) for Folium
+    poly_wgs84 = shape.boundary
+
+    # Map centred on the municipality's bounding box
+    center_lat, center_lon = shape.center
+
+    # Create base map
+    m = folium.Map(
+        location=[center_lat, center_lon],
+        zoom_start=12,
+        tiles='CartoDB positron'
+    )
+
+    # --- Layer 1: District Boundaries ---
+    boundaries_layer = FeatureGroup(name='District Boundaries', show=True)
+    folium.GeoJson(
+        poly_wgs84,
+        style_function=lambda x: {
+            'fillColor': 'transparent',
+            'color': '#333333',
+            'weight': 1,
+            'fillOpacity': 0
+        },
+        tooltip=folium.GeoJsonTooltip(fields=['Municipality'] if 'Municipality' in poly_wgs84.columns else [])
+    ).add_to(boundaries_layer)
+    boundaries_layer.add_to(m)
+
+    # --- Layer 2: Healthcare Facilities (one GeoJSON collection per category) ---
+    hospitals_wgs84 = point_popup_columns(hospitals_wgs84)
+    is_clinic = hospitals_wgs84['type_label'].str.contains('clinic', case=False)
+
+    point_layer(
+        hospitals_wgs84[~is_clinic], 'Hospitals',
+        color='#1d3557', fill_color='#e63946', radius=7,  # Red for hospitals
+        popup_fields=['name', 'type_label', 'coordinates'], tooltip_field='type_label'
+    ).add_to(m)
+    point_layer(
+        hospitals_wgs84[is_clinic], 'Clinics',
+        color='#6c3483', fill_color='#9b59b6', radius=7,  # Purple for clinics
+        popup_fields=['name', 'type_label', 'coordinates'], tooltip_field='type_label'
+    ).add_to(m)
+
+    # Add layer control (toggle layers on/off)
+    folium.LayerControl(collapsed=False).add_to(m)
+
+    # --- Custom Legend ---
+    legend_html = '''
+    <div style="position: fixed; top: 30px; left: 50px; z-index: 9999;
+                background: rgba(255,255,255,0.95); padding: 12px 16px; border-radius: 8px;
+                box-shadow: 0 2px 8px rgba(0,0,0,0.25); font-family: Arial, sans-serif; font-size: 12px;">
+        <h4 style="margin: 0 0 10px 0; color: #333; border-bottom: 1px solid #ddd; padding-bottom: 6px;">Map Legend</h4>
+        <div style="display: flex; align-items: center; margin: 5px 0;">
+            <span style="display: inline-block; width: 12px; height: 12px; background: #e63946; border: 2px solid #1d3557; border-radius: 50%; margin-right: 8px; margin-left: 9px;"></span>Hospital
+        </div>
+        <div style="display: flex; align-items: center; margin: 5px 0;">
+            <span style="display: inline-block; width: 14px; height: 14px; background: #9b59b6; border: 2px solid #6c3483; border-radius: 50%; margin-right: 8px; margin-left: 8px;"></span>Clinic
+        </div>
+        <div style="display: flex; align-items: center; margin: 5px 0;">
+            <span style="display: inline-block; width: 30px; height: 3px; background: #333333; margin-right: 8px;"></span>District Boundary
+        </div>
+    </div>
+    '''
+    m.get_root().html.add_child(folium.Element(legend_html))
+
+    # Add title
+    title_html = f'''
+    <div style="position: fixed; top: 10px; left: 50%; transform: translateX(-50%); z-index: 9999;
+                background: rgba(255,255,255,0.9); padding: 10px 20px; border-radius: 8px;
+                box-shadow: 0 2px 6px rgba(0,0,0,0.2); font-family: Arial, sans-serif;">
+        <h3 style="margin: 0; color: #1d3557;">{municipality} – Healthcare Facilities</h3>
+        <p style="margin: 5px 0 0 0; font-size: 12px; color: #666;">Toggle layers using the control on the right</p>
+    </div>
+    '''
+    m.get_root().html.add_child(folium.Element(title_html))
+    return m
+
+
+PAGE_MAPS = {
+    "roads": roads_map,
+    "rails": rails_map,
+    "schools": schools_map,
+    "hospitals": hospitals_map,
+}
+# Bump when a builder above changes what it draws, so renders stored by src.warm are not reused
+MAP_VERSION = 1
+# Settings a page's map depends on besides the municipality; part of the render cache key
+MAP_SETTINGS: Dict[str, Dict[str, Any]] = {
+    "roads": {"simplify": SIMPLIFY_TOLERANCE.get("roads")},
+}
+
+
+def map_settings(page: str) -> Dict[str, Any]:
+    """Render cache settings of a page's map."""
+    return {**MAP_SETTINGS.get(page, {}), "map_version": MAP_VERSION}
+
+
+def page_map(page: str, municipality: str, version: str = DATA_VERSION) -> RenderedMap:
+    """The rendered map of a page (key in PAGE_MAPS) for a municipality, built only on a cache miss."""
+    return cached_map(page, municipality, partial(PAGE_MAPS[page], municipality), map_settings(page), version)
+
+
+MAP_BACKENDS = ("folium", "deck")
+
+
+def map_backend(page: str) -> str:
+    """The backend drawing a page's map: DASHBOARD_MAP_BACKEND_<PAGE>, else DASHBOARD_MAP_BACKEND, else folium."""
+    backend = os.environ.get(f"DASHBOARD_MAP_BACKEND_{page.upper()}") or os.environ.get("DASHBOARD_MAP_BACKEND", "folium")
+    if backend not in MAP_BACKENDS:
+        raise ValueError(f"Unknown map backend {backend!r} for {page}; expected {' or '.join(MAP_BACKENDS)}")
+    return backend
+
+
+def draw_map(page: str, municipality: str, height: int = 1500):
+    """Draw a page's map for a municipality with its configured backend, marking the page's stages."""
+    if map_backend(page) == "deck":
+        deck = deck_map(page, municipality)
+        mark("build_map")
+        st.markdown(deck.legend_html(), unsafe_allow_html=True)
+        st.pydeck_chart(deck, height=height)
+        mark("pydeck_chart")
+        return
+    rendered = page_map(page, municipality)
+    mark("build_map")
+    show_map(rendered, height=height, use_container_width=True, returned_objects=[])
+    mark("st_folium")
+
+
+@st.fragment
+def national_roads_section(height: int = 800):
+    """
+    The whole road network drawn with deck.gl, behind a toggle as it is large to send. A
+    fragment, so showing or hiding it reruns only this section.
+    """
+    if not st.toggle("Show the national road network", key="national_roads"):
+        return
+    deck = national_roads_deck()
+    st.markdown(deck.legend_html(), unsafe_allow_html=True)
+    st.pydeck_chart(deck, height=height)
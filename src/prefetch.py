@@ -0,0 +1,82 @@
+import os
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Dict, Tuple
+
+import streamlit as st
+
+from src.utils import DATA_VERSION, DEFAULT_MUNICIPALITY, PREPARED_LOADERS, load_poly, load_municipality_layer
+from src.aggregates import AGGREGATES, load_aggregates
+
+
+THREAD_PREFIX = "prefetch"
+
+
+class _PrefetchThreadFilter(logging.Filter):
+    """Drop Streamlit's missing-ScriptRunContext warning for prefetch threads, which run outside any session by design."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return not threading.current_thread().name.startswith(THREAD_PREFIX)
+
+
+logging.getLogger("streamlit.runtime.scriptrunner_utils.script_run_context").addFilter(_PrefetchThreadFilter())
+
+
+class Prefetcher:
+    """
+    Runs loader calls concurrently on a thread pool so their caches are filled before a page asks.
+
+    The tasks go through the same cached functions the pages call, so a page that needs a
+    layer still being fetched waits on the memory cache's per-key lock for that layer only,
+    while the other downloads carry on.
+    """
+
+    def __init__(self, tasks: Dict[str, Callable[[], Any]], max_workers: int = 8):
+        pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=THREAD_PREFIX)
+        self.futures: Dict[str, Future] = {name: pool.submit(task) for name, task in tasks.items()}
+        pool.shutdown(wait=False)
+
+    def progress(self) -> Tuple[int, int]:
+        """Return (finished tasks, total tasks)."""
+        return sum(future.done() for future in self.futures.values()), len(self.futures)
+
+    def done(self) -> bool:
+        """Whether every task has finished."""
+        finished, total = self.progress()
+        return finished == total
+
+    def errors(self) -> Dict[str, BaseException]:
+        """Exceptions raised by finished tasks; the page that needs the layer will raise it again."""
+        return {
+            name: future.exception() for name, future in self.futures.items()
+            if future.done() and future.exception() is not None
+        }
+
+
+def dashboard_tasks(
+    municipality: str = DEFAULT_MUNICIPALITY, version: str = DATA_VERSION
+) -> Dict[str, Callable[[], Any]]:
+    """
+    Loader calls made by the dashboard pages on their first run: the municipality polygons,
+    each layer's aggregate table and the map features of the default municipality, all for
+    one dataset version.
+    """
+    tasks: Dict[str, Callable[[], Any]] = {"poly": partial(load_poly, version)}
+    for layer in PREPARED_LOADERS:
+        tasks[f"map:{layer}"] = partial(load_municipality_layer, layer, municipality, version)
+    for layer in AGGREGATES:
+        tasks[f"aggregates:{layer}"] = partial(load_aggregates, layer, version)
+    return tasks
+
+
+@st.cache_resource
+def start_prefetch(version: str = DATA_VERSION) -> Prefetcher:
+    """
+    Start warming the dashboard caches in the background, once per process and dataset version.
+    Set DASHBOARD_PREFETCH=0 to disable it (the pages then load layers on demand).
+    """
+    if os.environ.get("DASHBOARD_PREFETCH", "1") == "0":
+        return Prefetcher({})
+    return Prefetcher(dashboard_tasks(version=version))
@@ -0,0 +1,54 @@
+"""
+Sidebar municipality selector shared by the infrastructure pages.
+
+The selector is a Streamlit fragment, so typing in it reruns only the selector. The page
+reruns only once the text resolves to a different municipality: partial, ambiguous or
+misspelt input, or another spelling of the municipality already shown, leaves the overview
+and the map as they are.
+"""
+import streamlit as st
+
+from src.utils import DEFAULT_MUNICIPALITY, find_municipality_match, load_name_lookup
+
+
+@st.fragment
+def _municipality_selector():
+    st.markdown("### 🔎 Municipality selector")
+    st.text_input(
+        "Highlight a municipality (you can type partial or accent-free name, e.g., sabac or Nis):",
+        placeholder="e.g., sabac or Nis",
+        key="highlight_municipality"
+    )
+    name_lookup = load_name_lookup()
+    if st.session_state.highlight_municipality.strip():
+        matches = find_municipality_match(st.session_state.highlight_municipality, name_lookup)
+
+        if len(matches) == 1:
+            st.session_state.valid_municipality = matches[0]
+            st.success(f"✅ Highlighted Municipality: **{st.session_state.valid_municipality}**")
+
+        elif len(matches) > 1:
+            st.info(f"Found multiple matches: {', '.join(matches[:])}... (showing: **{st.session_state.valid_municipality}**)")
+        else:
+            st.warning(f"No match found. Try typing part of the name or removing accents. (showing: **{st.session_state.valid_municipality}**)")
+
+    # On a selector-only rerun the rest of the page still shows page_municipality
+    if st.session_state.valid_municipality != st.session_state.page_municipality:
+        st.rerun()
+
+
+def municipality_selector() -> str:
+    """
+    Draw the municipality selector in the sidebar.
+
+    Returns:
+        The municipality the page shows; it changes only when the visitor's input matches exactly one
+    """
+    if 'highlight_municipality' not in st.session_state:
+        st.session_state.highlight_municipality = DEFAULT_MUNICIPALITY
+    if 'valid_municipality' not in st.session_state:
+        st.session_state.valid_municipality = DEFAULT_MUNICIPALITY
+    st.session_state.page_municipality = st.session_state.valid_municipality
+    with st.sidebar:
+        _municipality_selector()
+    return st.session_state.page_municipality
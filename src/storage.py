@@ -0,0 +1,222 @@
+"""
+Storage backends for the objects the dashboard reads and writes.
+
+The backend is chosen with DASHBOARD_STORAGE:
+
+    gcs     Google Cloud Storage (default), authenticated with the [gcs] service account in
+            .streamlit/secrets.toml or, without one, application default credentials
+    local   a directory mirroring the buckets: <DASHBOARD_STORAGE_ROOT>/<bucket>/<path>
+    memory  a process-local store, empty at start (for tests and benchmarks)
+
+The GCS client is configured with DASHBOARD_GCS_TIMEOUT (seconds per request, default 60),
+DASHBOARD_GCS_RETRY_DEADLINE (seconds across retries of a call, default 300) and
+DASHBOARD_GCS_POOL_SIZE (HTTP connections kept open, default 16).
+"""
+import os
+import tempfile
+import threading
+from abc import ABC, abstractmethod
+from typing import Dict, Optional, Tuple
+
+import streamlit as st
+from google.api_core.exceptions import NotFound, PreconditionFailed
+from google.auth import default as default_credentials
+from google.auth.transport.requests import AuthorizedSession
+from google.cloud import storage
+from google.cloud.storage.retry import DEFAULT_RETRY
+from google.oauth2 import service_account
+from requests.adapters import HTTPAdapter
+
+
+class ObjectInfo:
+    """Metadata of a stored object. `version` changes whenever the object's contents do."""
+
+    def __init__(self, version: str, size: int, checksum: Optional[str] = None):
+        self.version = version
+        self.size = size
+        self.checksum = checksum
+
+
+class ObjectChangedError(Exception):
+    """The object was replaced after the version a read asked for was looked up."""
+
+
+class StorageBackend(ABC):
+    """Reads and writes objects addressed by bucket name and path within the bucket."""
+
+    # Whether downloads are worth keeping in the on-disk blob cache
+    cacheable = False
+
+    @abstractmethod
+    def stat(self, bucket_name: str, path: str) -> Optional[ObjectInfo]:
+        """Return the object's metadata, or None if it does not exist."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def read(self, bucket_name: str, path: str, version: Optional[str] = None) -> bytes:
+        """
+        Return the object's contents.
+
+        Args:
+            bucket_name: Name of the bucket
+            path: Path of the object within the bucket
+            version: Version from stat(); where supported the read fails if the object has changed since
+
+        Raises:
+            FileNotFoundError: If the object does not exist
+            ObjectChangedError: If `version` was given and the object is no longer at it
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def write(self, bucket_name: str, path: str, data: bytes, content_type: str = "application/octet-stream"):
+        """Create or replace an object."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def url(self, bucket_name: str, path: str) -> str:
+        """Where the object lives, for messages."""
+        raise NotImplementedError
+
+
+class GCSBackend(StorageBackend):
+    """Objects in Google Cloud Storage, with one timeout and retry policy for every call."""
+
+    cacheable = True
+
+    def __init__(self, client: storage.Client, timeout: float = 60, retry_deadline: float = 300):
+        self.client = client
+        self.timeout = timeout
+        self.retry = DEFAULT_RETRY.with_timeout(retry_deadline)
+
+    def stat(self, bucket_name: str, path: str) -> Optional[ObjectInfo]:
+        blob = self.client.bucket(bucket_name).get_blob(path, timeout=self.timeout, retry=self.retry)
+        if blob is None:
+            return None
+        return ObjectInfo(str(blob.generation), blob.size, blob.md5_hash)
+
+    def read(self, bucket_name: str, path: str, version: Optional[str] = None) -> bytes:
+        blob = self.client.bucket(bucket_name).blob(path)
+        try:
+            return blob.download_as_bytes(
+                if_generation_match=int(version) if version is not None else None,
+                timeout=self.timeout, retry=self.retry
+            )
+        except NotFound:
+            raise FileNotFoundError(f"{self.url(bucket_name, path)} does not exist")
+        except PreconditionFailed:
+            raise ObjectChangedError(f"{self.url(bucket_name, path)} changed since generation {version}")
+
+    def write(self, bucket_name: str, path: str, data: bytes, content_type: str = "application/octet-stream"):
+        self.client.bucket(bucket_name).blob(path).upload_from_string(
+            data, content_type=content_type, timeout=self.timeout, retry=self.retry
+        )
+
+    def url(self, bucket_name: str, path: str) -> str:
+        return f"gs://{bucket_name}/{path}"
+
+
+class LocalBackend(StorageBackend):
+    """Objects as files under a root directory, one subdirectory per bucket."""
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def _file(self, bucket_name: str, path: str) -> str:
+        return os.path.join(self.root, bucket_name, *path.split("/"))
+
+    def stat(self, bucket_name: str, path: str) -> Optional[ObjectInfo]:
+        try:
+            info = os.stat(self._file(bucket_name, path))
+        except FileNotFoundError:
+            return None
+        return ObjectInfo(f"{info.st_mtime_ns}-{info.st_size}", info.st_size)
+
+    def read(self, bucket_name: str, path: str, version: Optional[str] = None) -> bytes:
+        try:
+            with open(self._file(bucket_name, path), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            raise FileNotFoundError(f"{self.url(bucket_name, path)} does not exist")
+
+    def write(self, bucket_name: str, path: str, data: bytes, content_type: str = "application/octet-stream"):
+        target = self._file(bucket_name, path)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(target), suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, target)
+
+    def url(self, bucket_name: str, path: str) -> str:
+        return self._file(bucket_name, path)
+
+
+class MemoryBackend(StorageBackend):
+    """Objects held in a dict for the life of the process."""
+
+    def __init__(self):
+        self._objects: Dict[Tuple[str, str], Tuple[bytes, str]] = {}
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def stat(self, bucket_name: str, path: str) -> Optional[ObjectInfo]:
+        with self._lock:
+            entry = self._objects.get((bucket_name, path))
+        if entry is None:
+            return None
+        data, version = entry
+        return ObjectInfo(version, len(data))
+
+    def read(self, bucket_name: str, path: str, version: Optional[str] = None) -> bytes:
+        with self._lock:
+            entry = self._objects.get((bucket_name, path))
+        if entry is None:
+            raise FileNotFoundError(f"{self.url(bucket_name, path)} does not exist")
+        return entry[0]
+
+    def write(self, bucket_name: str, path: str, data: bytes, content_type: str = "application/octet-stream"):
+        with self._lock:
+            self._generation += 1
+            self._objects[(bucket_name, path)] = (bytes(data), str(self._generation))
+
+    def url(self, bucket_name: str, path: str) -> str:
+        return f"memory://{bucket_name}/{path}"
+
+
+def _gcs_credentials():
+    """Service account from the [gcs] section of Streamlit secrets, else application default credentials."""
+    try:
+        info = dict(st.secrets["gcs"])
+    except (FileNotFoundError, KeyError):
+        return default_credentials()
+    info.setdefault("type", "service_account")
+    info.setdefault("universe_domain", "googleapis.com")
+    credentials = service_account.Credentials.from_service_account_info(info)
+    return credentials, info.get("project_id")
+
+
+def create_gcs_backend() -> GCSBackend:
+    """Build the GCS client with a connection pool sized for concurrent downloads."""
+    credentials, project = _gcs_credentials()
+    pool_size = int(os.environ.get("DASHBOARD_GCS_POOL_SIZE", "16"))
+    session = AuthorizedSession(credentials)
+    session.mount("https://", HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size))
+    client = storage.Client(project=project, credentials=credentials, _http=session)
+    return GCSBackend(
+        client,
+        timeout=float(os.environ.get("DASHBOARD_GCS_TIMEOUT", "60")),
+        retry_deadline=float(os.environ.get("DASHBOARD_GCS_RETRY_DEADLINE", "300")),
+    )
+
+
+@st.cache_resource
+def get_storage() -> StorageBackend:
+    """Create the configured storage backend on first use (shared by the whole process)."""
+    kind = os.environ.get("DASHBOARD_STORAGE", "gcs")
+    if kind == "gcs":
+        return create_gcs_backend()
+    if kind == "local":
+        return LocalBackend(os.environ.get("DASHBOARD_STORAGE_ROOT", "data"))
+    if kind == "memory":
+        return MemoryBackend()
+    raise ValueError(f"Unknown DASHBOARD_STORAGE {kind!r}; expected gcs, local or memory")
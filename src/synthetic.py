@@ -0,0 +1,155 @@
+"""
+Synthetic stand-ins for the dashboard layers, for benchmarks and offline development.
+
+Feature counts are scaled from SNAPSHOT_COUNTS, so scale=1 produces roughly as many
+features as the OSM snapshot the dashboard serves, scale=20 twenty times as many. The
+municipality polygons (Voronoi cells over Serbia's bounding box, densified to carry as
+many vertices as real boundaries) stay the same at every scale.
+"""
+from io import BytesIO
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+import shapely
+import geopandas as gpd
+
+from src.gcs import to_geoparquet_bytes, upload_blob
+from src.storage import StorageBackend
+from src.utils import BUCKET_NAME, DEFAULT_MUNICIPALITY, LAYER_PATHS
+
+
+# Approximate feature counts of the OSM snapshot (scale 1)
+SNAPSHOT_COUNTS = {
+    "roads": 400_000,
+    "rails": 6_000,
+    "stations": 600,
+    "schools": 4_000,
+    "hospitals": 1_500,
+}
+MUNICIPALITY_COUNT = 168
+# lon/lat bounding box of Serbia
+BOUNDS = (18.8, 42.2, 23.0, 46.2)
+# Real names given to the first cells, so page selectors can be exercised with familiar input
+NAMED_MUNICIPALITIES = [DEFAULT_MUNICIPALITY, "Šabac", "Niš", "Beograd", "Novi Sad", "Kragujevac", "Subotica", "Čačak"]
+
+FCLASS_SHARES = {
+    "residential": 0.30, "service": 0.20, "track": 0.15, "unclassified": 0.12, "footway": 0.08,
+    "tertiary": 0.05, "secondary": 0.035, "primary": 0.025, "trunk": 0.01,
+    "tertiary_link": 0.01, "secondary_link": 0.008, "primary_link": 0.007, "trunk_link": 0.005,
+}
+SCHOOL_TYPES = {"school": 0.75, "kindergarten": 0.15, "university": 0.05, "college": 0.05}
+HOSPITAL_TYPES = {"hospital": 0.2, "clinic": 0.5, "doctors": 0.3}
+
+
+def municipality_polygons(rng: np.random.Generator, count: int = MUNICIPALITY_COUNT) -> gpd.GeoDataFrame:
+    """Voronoi cells over BOUNDS with boundaries densified to ~500m vertex spacing."""
+    minx, miny, maxx, maxy = BOUNDS
+    seeds = shapely.points(rng.uniform(minx, maxx, count), rng.uniform(miny, maxy, count))
+    extent = shapely.box(*BOUNDS)
+    cells = shapely.get_parts(shapely.voronoi_polygons(shapely.multipoints(seeds), extend_to=extent))
+    cells = shapely.segmentize(shapely.intersection(cells, extent), 0.005)
+    names = NAMED_MUNICIPALITIES + [f"Opština {i:03d}" for i in range(len(NAMED_MUNICIPALITIES), len(cells))]
+    return gpd.GeoDataFrame(
+        {"Municipality": names[:len(cells)], "code": np.arange(len(cells))}, geometry=cells, crs="EPSG:4326"
+    )
+
+
+def random_lines(rng: np.random.Generator, count: int, vertices: int, step: float) -> np.ndarray:
+    """Short random-walk polylines starting anywhere in BOUNDS."""
+    minx, miny, maxx, maxy = BOUNDS
+    start = np.column_stack([rng.uniform(minx, maxx, count), rng.uniform(miny, maxy, count)])
+    heading = rng.uniform(0, 2 * np.pi, count)[:, None] + rng.normal(0, 0.3, (count, vertices - 1))
+    steps = step * np.stack([np.cos(heading), np.sin(heading)], axis=-1)
+    coords = np.concatenate([start[:, None, :], start[:, None, :] + np.cumsum(steps, axis=1)], axis=1)
+    return shapely.linestrings(coords)
+
+
+def random_points(rng: np.random.Generator, count: int) -> np.ndarray:
+    minx, miny, maxx, maxy = BOUNDS
+    return shapely.points(rng.uniform(minx, maxx, count), rng.uniform(miny, maxy, count))
+
+
+def _choice(rng: np.random.Generator, shares: Dict[str, float], count: int) -> np.ndarray:
+    values = list(shares)
+    weights = np.array([shares[v] for v in values])
+    return rng.choice(values, count, p=weights / weights.sum())
+
+
+def _yes_no(rng: np.random.Generator, share: float, count: int) -> np.ndarray:
+    return np.where(rng.random(count) < share, "T", "F")
+
+
+def synthetic_layers(scale: float = 1, seed: int = 0) -> Dict[str, gpd.GeoDataFrame]:
+    """
+    Generate every dashboard layer.
+
+    Args:
+        scale: Multiple of SNAPSHOT_COUNTS to generate
+        seed: Random seed; the same scale and seed always give the same data
+
+    Returns:
+        {layer name: GeoDataFrame in EPSG:4326}, keyed like LAYER_PATHS
+    """
+    rng = np.random.default_rng(seed)
+    counts = {layer: max(1, int(count * scale)) for layer, count in SNAPSHOT_COUNTS.items()}
+    layers = {"poly": municipality_polygons(rng)}
+
+    n = counts["roads"]
+    layers["roads"] = gpd.GeoDataFrame({
+        "osm_id": np.arange(n), "fclass": _choice(rng, FCLASS_SHARES, n), "name": None,
+        "bridge": _yes_no(rng, 0.03, n), "tunnel": _yes_no(rng, 0.003, n),
+    }, geometry=random_lines(rng, n, 6, 0.002), crs="EPSG:4326")
+
+    n = counts["rails"]
+    layers["rails"] = gpd.GeoDataFrame({
+        "osm_id": np.arange(n), "bridge": _yes_no(rng, 0.05, n), "tunnel": _yes_no(rng, 0.02, n),
+    }, geometry=random_lines(rng, n, 8, 0.004), crs="EPSG:4326")
+
+    n = counts["stations"]
+    names = np.array([f"Station {i}" for i in range(n)], dtype=object)
+    names[rng.random(n) < 0.2] = None
+    layers["stations"] = gpd.GeoDataFrame({"name": names}, geometry=random_points(rng, n), crs="EPSG:4326")
+
+    n = counts["schools"]
+    layers["schools"] = gpd.GeoDataFrame({
+        "name": [f"School {i}" for i in range(n)], "type": _choice(rng, SCHOOL_TYPES, n),
+    }, geometry=random_points(rng, n), crs="EPSG:4326")
+
+    n = counts["hospitals"]
+    layers["hospitals"] = gpd.GeoDataFrame({
+        "name": [f"Health centre {i}" for i in range(n)], "type": _choice(rng, HOSPITAL_TYPES, n),
+    }, geometry=random_points(rng, n), crs="EPSG:4326")
+    return layers
+
+
+def write_synthetic_dataset(storage: StorageBackend, scale: float = 1, seed: int = 0, data_format: str = "parquet") -> List[str]:
+    """
+    Write a synthetic dataset to LAYER_PATHS in BUCKET_NAME, in the layout the loaders read.
+
+    Args:
+        storage: Backend to write to
+        scale: Multiple of SNAPSHOT_COUNTS to generate
+        seed: Random seed
+        data_format: "parquet" (as written by src.convert) or "geojson" (the original layout,
+            with schools as a CSV of coordinates)
+
+    Returns:
+        The paths written
+    """
+    paths = []
+    for name, layer in synthetic_layers(scale, seed).items():
+        if data_format == "parquet":
+            path, data = f"{LAYER_PATHS[name]}.parquet", to_geoparquet_bytes(layer)
+        elif name == "schools":
+            csv = pd.DataFrame({
+                "name": layer["name"], "type": layer["type"], "lon": layer.geometry.x, "lat": layer.geometry.y
+            })
+            buffer = BytesIO()
+            csv.to_csv(buffer, index=False)
+            path, data = f"{LAYER_PATHS[name]}.csv", buffer.getvalue()
+        else:
+            path, data = f"{LAYER_PATHS[name]}.geojson", layer.to_json().encode("utf-8")
+        upload_blob(storage, BUCKET_NAME, path, data)
+        paths.append(path)
+    return paths
@@ -0,0 +1,154 @@
+"""
+Lightweight timing spans for page runs.
+
+    with span("download", path=path) as s:
+        data = fetch()
+        s.set(bytes=len(data))
+
+A page calls start_run() before anything else, mark() after each of its stages and
+finish_run() at the end. A mark times the stage since the previous one, so top-level page
+code needs no re-indenting; spans opened by the loaders the page calls are nested under the
+stage they ran in. The run is logged as one JSON line on the "dashboard.timing" logger, and
+with `?debug=1` in the page URL it is also listed in a sidebar panel. Spans opened outside a
+page run (the startup prefetch, the build CLI) are logged one line each. Cached loaders
+only record spans when they actually run, so a cache hit shows as a stage with nothing
+under it. The run's log line also carries the memory cache counters (src/memory_cache.py).
+
+The log level is set with DASHBOARD_TIMING_LOG_LEVEL (default INFO; WARNING silences it).
+"""
+import os
+import sys
+import json
+import time
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional
+
+import pandas as pd
+import streamlit as st
+
+from src.memory_cache import get_memory_cache
+
+
+logger = logging.getLogger("dashboard.timing")
+if not logger.handlers:
+    _handler = logging.StreamHandler(sys.stderr)
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(_handler)
+    logger.propagate = False
+logger.setLevel(os.environ.get("DASHBOARD_TIMING_LOG_LEVEL", "INFO").upper())
+
+
+class Span:
+    """One timed stage: its name, nesting depth, duration and any attributes (rows, bytes, ...)."""
+
+    def __init__(self, name: str, depth: int, attrs: Dict[str, Any]):
+        self.name = name
+        self.depth = depth
+        self.attrs = attrs
+        self.ms: Optional[float] = None
+
+    def set(self, **attrs: Any):
+        """Attach attributes to the span, e.g. set(rows=len(df), bytes=len(data))."""
+        self.attrs.update(attrs)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"name": self.name, "depth": self.depth, "ms": self.ms, **self.attrs}
+
+
+class PageRun:
+    """Spans recorded during one run of a page script."""
+
+    def __init__(self, page: str):
+        self.page = page
+        self.spans: List[Span] = []
+        self.start = time.perf_counter()
+        # Where the current stage started, in time and in self.spans
+        self.stage_start = self.start
+        self.stage_index = 0
+
+
+_run: ContextVar[Optional[PageRun]] = ContextVar("timing_run", default=None)
+_depth: ContextVar[int] = ContextVar("timing_depth", default=0)
+
+
+@contextmanager
+def span(name: str, **attrs: Any) -> Iterator[Span]:
+    """Time the enclosed block as a stage of the current page run (or on its own outside one)."""
+    depth = _depth.get()
+    current = Span(name, depth, attrs)
+    run = _run.get()
+    if run is not None:
+        run.spans.append(current)
+    token = _depth.set(depth + 1)
+    start = time.perf_counter()
+    try:
+        yield current
+    finally:
+        current.ms = round((time.perf_counter() - start) * 1000, 2)
+        _depth.reset(token)
+        if run is None and logger.isEnabledFor(logging.INFO):
+            logger.info(json.dumps({"event": "span", **current.to_dict()}, default=str, ensure_ascii=False))
+
+
+def start_run(page: str) -> PageRun:
+    """Begin collecting spans for a run of `page`; call at the top of the page script."""
+    run = PageRun(page)
+    _run.set(run)
+    _depth.set(0)
+    return run
+
+
+def mark(name: str, **attrs: Any):
+    """
+    Close the page's current stage as `name`: a top-level span from the previous mark (or the
+    start of the run) to now, with the spans recorded since nested under it.
+    """
+    run = _run.get()
+    if run is None:
+        return
+    now = time.perf_counter()
+    for inner in run.spans[run.stage_index:]:
+        inner.depth += 1
+    stage = Span(name, 0, attrs)
+    stage.ms = round((now - run.stage_start) * 1000, 2)
+    run.spans.insert(run.stage_index, stage)
+    run.stage_start = now
+    run.stage_index = len(run.spans)
+
+
+def _debug_enabled() -> bool:
+    return st.query_params.get("debug", "0") not in ("", "0", "false")
+
+
+def finish_run(**attrs: Any):
+    """
+    Log the current run's spans as one JSON line and, with ?debug=1, show them in the sidebar.
+
+    Args:
+        **attrs: Extra fields for the log line (e.g. the selected municipality)
+    """
+    run = _run.get()
+    if run is None:
+        return
+    _run.set(None)
+    total_ms = round((time.perf_counter() - run.start) * 1000, 2)
+    spans = [s.to_dict() for s in run.spans]
+    cache = get_memory_cache().stats()
+    if logger.isEnabledFor(logging.INFO):
+        logger.info(json.dumps(
+            {"event": "page_run", "page": run.page, "total_ms": total_ms, **attrs, "cache": cache, "spans": spans},
+            default=str, ensure_ascii=False
+        ))
+    if _debug_enabled():
+        with st.sidebar.expander(f"⏱️ Timing: {total_ms:.0f} ms", expanded=True):
+            st.caption(
+                f"Memory cache: {cache['entries']} entries, {cache['bytes'] / 2**20:.0f} / "
+                f"{cache['max_bytes'] / 2**20:.0f} MiB, {cache['hits']} hits, {cache['misses']} misses, "
+                f"{cache['evictions']} evictions, {cache['oversized']} too large to keep"
+            )
+            table = pd.DataFrame(spans)
+            if not table.empty:
+                table["name"] = ["\u2003" * depth + name for depth, name in zip(table.pop("depth"), table["name"])]
+            st.dataframe(table, hide_index=True, use_container_width=True)
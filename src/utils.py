@@ -1,70 +1,467 @@
+import os
+import json
 import unicodedata
 import difflib
-from typing import Dict, List
+from functools import cached_property
+from typing import Dict, List, Optional, Tuple
 
-from google.oauth2 import service_account
-from google.cloud import storage
-import streamlit as st
+import numpy as np
+import pandas as pd
+import shapely
+import geopandas as gpd
 
-from src.gcs import read_geojson_from_gcs, read_csv_from_gcs
+from src.gcs import download_blob, read_geojson_from_gcs, read_geoparquet_from_gcs, read_csv_from_gcs
+from src.memory_cache import cached
+from src.overlay import clip_lines
+from src.storage import get_storage
+from src.timing import span
 
 
-# --- Initialization ---
-@st.cache_resource
-def init_gcs_client():
-    """Initialize Google Cloud Storage client using credentials from Streamlit secrets."""
-    creds_dict = {
-        "type": "service_account",
-        "project_id": st.secrets["gcs"]["project_id"],
-        "private_key_id": st.secrets["gcs"]["private_key_id"],
-        "private_key": st.secrets["gcs"]["private_key"], 
-        "client_email": st.secrets["gcs"]["client_email"],
-        "client_id": st.secrets["gcs"]["client_id"],
-        "auth_uri": st.secrets["gcs"]["auth_uri"],
-        "token_uri": st.secrets["gcs"]["token_uri"],
-        "auth_provider_x509_cert_url": st.secrets["gcs"]["auth_provider_x509_cert_url"],
-        "client_x509_cert_url": st.secrets["gcs"]["client_x509_cert_url"],
-        "universe_domain": "googleapis.com"
-    }
-    credentials = service_account.Credentials.from_service_account_info(creds_dict)
-    return storage.Client(credentials=credentials)
+BUCKET_NAME = "wb-gpbp-infra-dashboard"
+# Bump when the layers in the bucket are regenerated so prepared caches are rebuilt.
+DATA_VERSION = "osm-2025-01-01"
+# Build artefacts written by `python -m src.build` live under PARTITION_ROOT/<version>/
+PARTITION_ROOT = "partitions"
+# Municipality the pages show until the visitor picks another one
+DEFAULT_MUNICIPALITY = "Veliko Gradište"
+# "parquet" reads the GeoParquet copies written by `python -m src.convert`, "geojson" the originals.
+DATA_FORMAT = os.environ.get("DASHBOARD_DATA_FORMAT", "geojson")
 
-storage_client = init_gcs_client()
+# Layers in the bucket (without extension)
+LAYER_PATHS = {
+    "poly": "shapefiles/muni_poly_final",
+    "rails": "shapefiles/rails_final",
+    "stations": "shapefiles/stations_final",
+    "schools": "shapefiles/school_assets",
+    "hospitals": "shapefiles/hospital_assets",
+    "roads": "shapefiles/roads_final",
+}
+# Columns the dashboard uses from each layer and how they are held in memory:
+#   category  repeated labels (road class, facility type): one small integer code per row
+#   flag      OSM "T"/"F" attributes, as booleans
+#   string    free text such as names, kept as Python strings
+#   float32   measurements needing no more than float32's ~7 significant digits
+# Every other column is dropped when the layer is read.
+LAYER_SCHEMAS = {
+    "poly": {"Municipality": "string"},
+    "rails": {"bridge": "flag", "tunnel": "flag"},
+    "stations": {"name": "string"},
+    "schools": {"name": "string", "type": "category"},
+    "hospitals": {"name": "string", "type": "category"},
+    "roads": {"fclass": "category", "bridge": "flag", "tunnel": "flag"},
+}
+# Columns added to every layer when it is prepared. Piece lengths are under 1000 km, so
+# float32 keeps them to the centimetre; sums are taken in float64 (see src.aggregates).
+PREPARED_SCHEMA = {"Municipality": "category", "length_km": "float32"}
+LAYER_COLUMNS = {layer: [*schema, "geometry"] for layer, schema in LAYER_SCHEMAS.items()}
+# Schools are published as a CSV of coordinates rather than GeoJSON
+SCHOOL_CSV_DTYPES = {"name": "object", "type": "category", "lon": "float64", "lat": "float64"}
+# Line lengths are measured in UTM zone 34N, which covers Serbia (18°E-24°E) with a scale
+# error under 0.1%; Web Mercator would overstate them by ~1.4x at these latitudes.
+LENGTH_CRS = "EPSG:32634"
 
-@st.cache_data
-def load_poly():
-    """Load municipality polygons (cached)."""
-    return read_geojson_from_gcs(storage_client, "wb-gpbp-infra-dashboard", "shapefiles/muni_poly_final.geojson") 
 
+def layer_blob_path(name: str) -> str:
+    """Path in the bucket of a source layer in the configured storage format."""
+    if DATA_FORMAT == "parquet":
+        return f"{LAYER_PATHS[name]}.parquet"
+    return f"{LAYER_PATHS[name]}.{'csv' if name == 'schools' else 'geojson'}"
 
-@st.cache_data
-def load_rails():
-    """Load railway lines (cached)."""
-    return read_geojson_from_gcs(storage_client, "wb-gpbp-infra-dashboard", "shapefiles/rails_final.geojson")
 
+def apply_schema(features: gpd.GeoDataFrame, schema: Dict[str, str]) -> gpd.GeoDataFrame:
+    """
+    Keep the geometry and the schema's columns that exist in `features`, converted to their
+    compact dtypes (see LAYER_SCHEMAS). Columns already in their target dtype are left as is.
+    """
+    columns = [column for column in schema if column in features.columns]
+    features = features[columns + [features.geometry.name]]
+    converted = {}
+    for column in columns:
+        values = features[column]
+        kind = schema[column]
+        if kind == "category" and not isinstance(values.dtype, pd.CategoricalDtype):
+            converted[column] = values.astype("category")
+        elif kind == "flag" and values.dtype != bool:
+            converted[column] = values.eq("T")
+        elif kind == "float32" and values.dtype != np.float32:
+            converted[column] = values.astype(np.float32)
+    return features.assign(**converted)
+
+
+def memory_mb(frame: pd.DataFrame) -> float:
+    """
+    Memory held by a frame's columns in MiB, counting string contents. Geometries count as
+    one pointer each: their coordinates live in GEOS and are not included.
+    """
+    return round(frame.memory_usage(deep=True).sum() / 2**20, 2)
+
+
+def read_school_csv() -> gpd.GeoDataFrame:
+    """Read the schools CSV with fixed dtypes and build its point geometries in one vectorized call."""
+    schools = read_csv_from_gcs(
+        get_storage(), BUCKET_NAME, f"{LAYER_PATHS['schools']}.csv",
+        usecols=list(SCHOOL_CSV_DTYPES), dtype=SCHOOL_CSV_DTYPES
+    )
+    return gpd.GeoDataFrame(
+        schools.drop(columns=["lon", "lat"]),
+        geometry=gpd.points_from_xy(schools["lon"], schools["lat"]),
+        crs="EPSG:4326"
+    )
+
+
+def read_layer(name: str) -> gpd.GeoDataFrame:
+    """
+    Read a vector layer from the bucket in the configured storage format, reduced to its
+    LAYER_SCHEMAS columns and dtypes. GeoParquet only decodes those columns.
+    
+    The memory of the layer as read and after the schema is applied is recorded on the
+    read_layer timing span (`raw_mb`, `mb`).
+    
+    Args:
+        name: Key in LAYER_PATHS
+        
+    Returns:
+        GeoDataFrame with the schema's columns that exist in the layer
+    """
+    path = layer_blob_path(name)
+    with span("read_layer", layer=name) as s:
+        if DATA_FORMAT == "parquet":
+            layer = read_geoparquet_from_gcs(get_storage(), BUCKET_NAME, path, LAYER_COLUMNS[name])
+        elif name == "schools":
+            layer = read_school_csv()
+        else:
+            layer = read_geojson_from_gcs(get_storage(), BUCKET_NAME, path)
+        raw_mb = memory_mb(layer)
+        layer = apply_schema(layer, LAYER_SCHEMAS[name])
+        s.set(rows=len(layer), raw_mb=raw_mb, mb=memory_mb(layer))
+    return layer
+
+
+@cached
+def load_poly(version: str = DATA_VERSION):
+    """Load municipality polygons (cached per dataset version)."""
+    return read_layer("poly")
+
+
+def load_rails(version: str = DATA_VERSION):
+    """Load railway lines (not cached: only load_prepared_rails reads them, and keeps the result)."""
+    return read_layer("rails")
 
-@st.cache_data
-def load_stations():
-    """Load train stations (cached)."""
-    return read_geojson_from_gcs(storage_client, "wb-gpbp-infra-dashboard", "shapefiles/stations_final.geojson")
 
+@cached
+def load_stations(version: str = DATA_VERSION):
+    """Load train stations (cached per dataset version)."""
+    return read_layer("stations")
 
-@st.cache_data
-def load_schools():
-    """Load schools (cached)."""
-    return read_csv_from_gcs(storage_client, "wb-gpbp-infra-dashboard", "shapefiles/school_assets.csv")
 
+@cached
+def load_schools(version: str = DATA_VERSION):
+    """Load schools as points with a categorical type (cached per dataset version)."""
+    return read_layer("schools")
 
-@st.cache_data
-def load_hospitals():
-    """Load hospitals (cached)."""
-    return read_geojson_from_gcs(storage_client, "wb-gpbp-infra-dashboard", "shapefiles/hospital_assets.geojson")
 
+@cached
+def load_hospitals(version: str = DATA_VERSION):
+    """Load hospitals (cached per dataset version)."""
+    return read_layer("hospitals")
+
+
+def load_roads(version: str = DATA_VERSION):
+    """Load roads (not cached: only load_prepared_roads reads them, and keeps the result)."""
+    return read_layer("roads")
+
+# --- Municipality assignment ---
+class PointAssignment:
+    """
+    Outcome of assigning a point layer to municipalities.
+
+    `points` holds every point that lies in a municipality, once, with its `Municipality`
+    column set. Points in no polygon are left out of it and kept in `outside`; `boundary`
+    lists the assigned points that lie on a polygon edge (e.g. on a shared border), which
+    were given to the first municipality touching them.
+    """
+
+    def __init__(self, points: gpd.GeoDataFrame, outside: gpd.GeoDataFrame, boundary: gpd.GeoDataFrame):
+        self.points = points
+        self.outside = outside
+        self.boundary = boundary
+
+    def summary(self) -> Dict[str, int]:
+        """Counts of assigned, outside and boundary points."""
+        return {"assigned": len(self.points), "outside": len(self.outside), "boundary": len(self.boundary)}
+
+
+class MunicipalityAssigner:
+    """
+    Assigns points to municipalities with one bulk query against an STRtree of the
+    prepared municipality polygons, built once and reused for every point layer.
+    """
+
+    def __init__(self, poly: gpd.GeoDataFrame):
+        self.crs = poly.crs
+        self.names = poly['Municipality'].to_numpy()
+        self._polygons = np.asarray(poly.geometry)
+        shapely.prepare(self._polygons)
+        self._tree = shapely.STRtree(self._polygons)
+
+    def assign(self, points: gpd.GeoDataFrame) -> PointAssignment:
+        """
+        Tag each point with the municipality containing it.
+        
+        A point in a polygon's interior belongs to that polygon; a point only on edges goes
+        to the first polygon (in poly order) it touches.
+        
+        Args:
+            points: Point features in any CRS
+            
+        Returns:
+            PointAssignment with the points reprojected to the municipality CRS
+        """
+        with span("assign_points", rows=len(points)) as s:
+            points = points.to_crs(self.crs)
+            geoms = np.asarray(points.geometry)
+            point_idx, poly_idx = self._tree.query(geoms, predicate='intersects')
+            interior = shapely.contains(self._polygons[poly_idx], geoms[point_idx])
+
+            # Per point, prefer an interior match, then the lowest polygon position
+            order = np.lexsort((poly_idx, ~interior, point_idx))
+            _, first = np.unique(point_idx[order], return_index=True)
+            chosen = order[first]
+            matched = point_idx[chosen]
+            on_boundary = ~interior[chosen]
+
+            assigned = points.iloc[matched].assign(
+                Municipality=pd.Categorical(self.names[poly_idx[chosen]])
+            )
+            outside = points.iloc[np.setdiff1d(np.arange(len(points)), matched)]
+            result = PointAssignment(assigned, outside, assigned[on_boundary])
+            s.set(**result.summary())
+        return result
+
+
+@cached
+def load_municipality_assigner(version: str = DATA_VERSION) -> MunicipalityAssigner:
+    """Build the municipality STRtree (cached per dataset version)."""
+    return MunicipalityAssigner(load_poly(version))
+
+
+POINT_LOADERS = {
+    "stations": load_stations,
+    "schools": load_schools,
+    "hospitals": load_hospitals,
+}
+
+
+@cached
+def load_point_assignment(layer: str, version: str = DATA_VERSION) -> PointAssignment:
+    """Assign a point layer (key in POINT_LOADERS) to municipalities (cached per dataset version)."""
+    return load_municipality_assigner(version).assign(POINT_LOADERS[layer](version))
+
+
+# --- Prepared layers ---
+def line_length_km(lines: gpd.GeoSeries) -> pd.Series:
+    """Length of each line in km, measured in LENGTH_CRS (no reprojection if the lines are already in it)."""
+    if lines.crs is not None and not lines.crs.equals(LENGTH_CRS):
+        lines = lines.to_crs(LENGTH_CRS)
+    return lines.length / 1000
+
+
+LINE_LOADERS = {
+    "roads": load_roads,
+    "rails": load_rails,
+}
+
+
+def prepare_line_layer(layer: str, workers: int = 1, version: str = DATA_VERSION) -> gpd.GeoDataFrame:
+    """
+    Clip a line layer (key in LINE_LOADERS) to the municipalities and measure each piece, so a
+    line crossing a border counts towards each municipality only with the part inside it.
+    
+    Args:
+        layer: Key in LINE_LOADERS
+        workers: Processes to clip with (see src.overlay.clip_lines)
+        version: Dataset version
+        
+    Returns:
+        One row per line piece with the layer's schema columns plus `Municipality` and `length_km`
+    """
+    lines = LINE_LOADERS[layer](version)
+    with span("clip_lines", layer=layer, rows=len(lines), workers=workers) as s:
+        clipped = clip_lines(lines, load_poly(version), workers)
+        s.set(pieces=len(clipped))
+    with span("line_length", layer=layer):
+        measured = clipped.assign(length_km=line_length_km(clipped.geometry))
+    return apply_schema(measured, {**LAYER_SCHEMAS[layer], **PREPARED_SCHEMA})
+
+
+# Every rerun and session shares the same cached GeoDataFrame, so callers must treat
+# the loaded and prepared layers as read-only.
+@cached
+def load_prepared_roads(version: str = DATA_VERSION) -> gpd.GeoDataFrame:
+    """Load roads clipped to municipalities, with piece lengths (cached per dataset version)."""
+    return prepare_line_layer("roads", version=version)
+
+
+@cached
+def load_prepared_rails(version: str = DATA_VERSION) -> gpd.GeoDataFrame:
+    """Load railway lines clipped to municipalities, with piece lengths (cached per dataset version)."""
+    return prepare_line_layer("rails", version=version)
+
+
+@cached
+def load_prepared_stations(version: str = DATA_VERSION) -> gpd.GeoDataFrame:
+    """Load train stations reprojected and tagged with their municipality (cached per dataset version)."""
+    return load_point_assignment("stations", version).points
+
+
+@cached
+def load_prepared_schools(version: str = DATA_VERSION) -> gpd.GeoDataFrame:
+    """Load schools reprojected and tagged with their municipality (cached per dataset version)."""
+    return load_point_assignment("schools", version).points
+
+
+@cached
+def load_prepared_hospitals(version: str = DATA_VERSION) -> gpd.GeoDataFrame:
+    """Load healthcare facilities reprojected and tagged with their municipality (cached per dataset version)."""
+    return load_point_assignment("hospitals", version).points
+
+
+PREPARED_LOADERS = {
+    "roads": load_prepared_roads,
+    "rails": load_prepared_rails,
+    "stations": load_prepared_stations,
+    "schools": load_prepared_schools,
+    "hospitals": load_prepared_hospitals,
+}
+
+# Geometry simplification applied before drawing (tolerance in degrees, ~100m)
+SIMPLIFY_TOLERANCE = {"roads": 0.001}
+
+
+def to_render_layer(layer: str, features: gpd.GeoDataFrame) -> gpd.GeoDataFrame:
+    """
+    Turn prepared features into what the maps draw: WGS84 for Folium, simplified
+    geometries to reduce coordinate count, and Yes/No bridge and tunnel labels.
+    """
+    with span("to_render_layer", layer=layer, rows=len(features)):
+        features = features.to_crs("EPSG:4326")
+        if layer in SIMPLIFY_TOLERANCE:
+            features['geometry'] = features.geometry.simplify(tolerance=SIMPLIFY_TOLERANCE[layer], preserve_topology=True)
+        for column in ('bridge', 'tunnel'):
+            if column in features.columns:
+                features[column] = np.where(features[column], 'Yes', 'No')
+    return features
+
+
+# --- Municipality slices ---
+@cached
+def load_layer_index(layer: str, version: str = DATA_VERSION) -> Dict[str, np.ndarray]:
+    """
+    Row positions of each municipality's features in a prepared layer (cached per dataset
+    version), so selecting a municipality is an iloc take rather than a scan of the layer.
+    Municipalities without features are absent.
+    """
+    with span("layer_index", layer=layer):
+        return PREPARED_LOADERS[layer](version).groupby("Municipality", observed=True).indices
+
+
+class MunicipalityShape:
+    """One municipality's boundary in WGS84, ready to draw, with its bounding box and centroid."""
+
+    def __init__(self, name: str, boundary: gpd.GeoDataFrame):
+        self.name = name
+        # Rows of muni_poly_final for the municipality (shared: read-only)
+        self.boundary = boundary
+        # [minx, miny, maxx, maxy] in degrees
+        self.bounds = boundary.total_bounds
+
+    @property
+    def center(self) -> Tuple[float, float]:
+        """(lat, lon) of the middle of the bounding box, where the page maps are centred."""
+        minx, miny, maxx, maxy = self.bounds
+        return (miny + maxy) / 2, (minx + maxx) / 2
+
+    @cached_property
+    def centroid(self) -> Tuple[float, float]:
+        """(lat, lon) of the area centroid, computed in LENGTH_CRS on first use."""
+        projected = shapely.union_all(self.boundary.geometry.to_crs(LENGTH_CRS).values)
+        point = gpd.GeoSeries([shapely.centroid(projected)], crs=LENGTH_CRS).to_crs("EPSG:4326").iloc[0]
+        return point.y, point.x
+
+
+@cached
+def load_municipality_shapes(version: str = DATA_VERSION) -> Dict[str, MunicipalityShape]:
+    """Boundary, bounding box and centroid of every municipality (cached per dataset version)."""
+    poly = load_poly(version)
+    with span("municipality_shapes", rows=len(poly)):
+        wgs84 = poly.to_crs("EPSG:4326")
+        groups = poly.groupby("Municipality", observed=True).indices
+        return {name: MunicipalityShape(name, wgs84.iloc[positions]) for name, positions in groups.items()}
+
+
+def municipality_shape(municipality: str, version: str = DATA_VERSION) -> Optional[MunicipalityShape]:
+    """The boundary, bounding box and centroid of a municipality, or None if there is no such municipality."""
+    return load_municipality_shapes(version).get(municipality)
+
+
+# --- Per-municipality partitions ---
+def partition_prefix(version: str = DATA_VERSION) -> str:
+    """Bucket prefix holding the partition artefacts for a dataset version."""
+    return f"{PARTITION_ROOT}/{version}"
+
+
+@cached
+def load_partition(path: str, version: str = DATA_VERSION) -> gpd.GeoDataFrame:
+    """Load one per-municipality partition written by the build (cached per dataset version)."""
+    return read_geoparquet_from_gcs(get_storage(), BUCKET_NAME, path)
+
+
+@cached
+def load_partition_manifest(version: str = DATA_VERSION) -> Optional[dict]:
+    """
+    Load the build manifest listing the partitions and aggregate tables (cached per dataset version).
+    
+    Returns:
+        The manifest dict, or None if the artefacts have not been built for this version
+    """
+    try:
+        data = download_blob(get_storage(), BUCKET_NAME, f"{partition_prefix(version)}/manifest.json")
+    except FileNotFoundError:
+        return None
+    return json.loads(data)
+
+
+def load_municipality_layer(layer: str, municipality: str, version: str = DATA_VERSION) -> gpd.GeoDataFrame:
+    """
+    Load the render-ready features of a layer that fall in one municipality.
+    
+    Reads only that municipality's partition when the build artefacts exist; otherwise
+    takes its rows of the national prepared layer (see load_layer_index) and finishes them
+    with to_render_layer.
+    
+    Args:
+        layer: Key in PREPARED_LOADERS
+        municipality: Municipality name as in muni_poly_final
+        version: Dataset version
+        
+    Returns:
+        GeoDataFrame in EPSG:4326, safe for the caller to modify
+    """
+    with span("municipality_layer", layer=layer) as s:
+        manifest = load_partition_manifest(version)
+        path = manifest["layers"].get(layer, {}).get(municipality) if manifest is not None else None
+        if path is not None:
+            # Shallow copy: the caller may add or replace columns without touching the cached partition
+            features = load_partition(path, version).copy(deep=False)
+            s.set(source="partition")
+        else:
+            prepared = PREPARED_LOADERS[layer](version)
+            positions = load_layer_index(layer, version).get(municipality, np.array([], dtype=np.intp))
+            features = to_render_layer(layer, prepared.iloc[positions])
+            s.set(source="prepared")
+        s.set(rows=len(features))
+    return features
 
-@st.cache_data
-def load_roads():
-    """Load roads (cached)."""
-    return read_geojson_from_gcs(storage_client, "wb-gpbp-infra-dashboard", "shapefiles/roads_final.geojson")
 
 def normalize(text):
     return ''.join(
@@ -73,6 +470,12 @@ def normalize(text):
     ).lower().strip()
     
 
+@cached
+def load_name_lookup(version: str = DATA_VERSION) -> Dict[str, str]:
+    """Map normalized municipality names to the names in muni_poly_final (cached per dataset version)."""
+    return {normalize(s): s for s in load_poly(version)["Municipality"].unique()}
+
+
 def find_municipality_match(input_text: str, name_lookup: Dict[str, str]) -> List[str]:
     """
     Find municipality matches using fuzzy matching.
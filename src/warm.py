@@ -0,0 +1,270 @@
+"""
+Cache warmer: renders every page's map for every municipality ahead of demand.
+
+Run from the repository root after src.build (uses the storage backend configured as in
+src/storage.py):
+
+    python -m src.warm                          # every page and municipality, all CPUs
+    python -m src.warm --workers 4 --pages roads rails
+    python -m src.warm --municipalities Šabac Niš
+
+The maps are rendered on a process pool and stored under partitions/<DATA_VERSION>/maps/,
+where the pages pick them up on their first view instead of building the map (see
+src/map_cache.py). A stored render is only used with the build it was drawn from, so rerun
+the warmer after each build.
+
+The app can also warm itself at start-up with DASHBOARD_WARM=1: it loads the aggregate
+tables and every municipality's slices into the memory cache and runs this command with
+DASHBOARD_WARM_WORKERS processes (default 2), moving each stored map into the render cache,
+with the progress shown in the sidebar. Size DASHBOARD_RENDER_CACHE_MAX_MB to hold every map, or the least recently
+used ones are dropped again.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from functools import partial
+from multiprocessing import get_context
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import streamlit as st
+
+from src.aggregates import AGGREGATES, load_aggregates
+from src.map_cache import RenderedMap, get_render_cache, load_stored_map, map_key, render_map, store_map
+from src.memory_cache import MemoryCache
+from src.page_maps import PAGE_MAPS, map_settings
+from src.prefetch import THREAD_PREFIX, Prefetcher
+from src.utils import (
+    DATA_VERSION, DEFAULT_MUNICIPALITY, PREPARED_LOADERS, load_layer_index, load_municipality_layer,
+    load_partition_manifest, load_poly
+)
+
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def all_municipalities(version: str = DATA_VERSION) -> List[str]:
+    """Every municipality, the pages' default first and the rest alphabetically."""
+    names = sorted(load_poly(version)["Municipality"].unique())
+    return sorted(names, key=lambda name: name != DEFAULT_MUNICIPALITY)
+
+
+def _render(page: str, municipality: str) -> Dict[str, Any]:
+    """Worker: render one map. Each worker process keeps the layers it loaded for the next map."""
+    return render_map(PAGE_MAPS[page](municipality)).to_dict()
+
+
+def slice_tasks(municipalities: List[str], version: str = DATA_VERSION) -> Dict[str, Callable[[], Any]]:
+    """
+    Loader calls that fill the memory cache with the aggregate tables and every municipality's
+    slices: the partitions when the build artefacts exist, otherwise the prepared layers the
+    slices are cut from and their municipality index.
+    """
+    tasks: Dict[str, Callable[[], Any]] = {"poly": partial(load_poly, version)}
+    for layer in AGGREGATES:
+        tasks[f"aggregates:{layer}"] = partial(load_aggregates, layer, version)
+    if load_partition_manifest(version) is None:
+        for layer in PREPARED_LOADERS:
+            tasks[f"index:{layer}"] = partial(load_layer_index, layer, version)
+    else:
+        for layer in PREPARED_LOADERS:
+            for municipality in municipalities:
+                tasks[f"slice:{layer}:{municipality}"] = partial(load_municipality_layer, layer, municipality, version)
+    return tasks
+
+
+class Warmer:
+    """
+    Renders maps on a process pool, handing each finished one to `on_render`.
+
+    The pool is spawned rather than forked, so the workers do not inherit the threads and
+    locks of the process that starts them; each loads the layers it needs once and reuses
+    them for the following maps.
+    """
+
+    def __init__(
+        self, pages: List[str], municipalities: List[str], on_render: Callable[[str, str, RenderedMap], None],
+        workers: int = 1
+    ):
+        self.on_render = on_render
+        self.failed: Dict[str, BaseException] = {}
+        self.finished = 0
+        self._lock = threading.Lock()
+        self._all_done = threading.Event()
+        pool = ProcessPoolExecutor(max_workers=max(1, workers), mp_context=get_context("spawn"))
+        # Municipality by municipality, so the first ones listed are ready on every page first
+        self.futures: Dict[Future, Tuple[str, str]] = {
+            pool.submit(_render, page, municipality): (page, municipality)
+            for municipality in municipalities for page in pages
+        }
+        if not self.futures:
+            self._all_done.set()
+        for future in self.futures:
+            future.add_done_callback(self._finished)
+        pool.shutdown(wait=False)
+
+    def _finished(self, future: Future):
+        page, municipality = self.futures[future]
+        try:
+            self.on_render(page, municipality, RenderedMap.from_dict(future.result()))
+        except BaseException as error:  # reported through errors(); the page will build the map itself
+            self.failed[f"{page}:{municipality}"] = error
+        with self._lock:
+            self.finished += 1
+            if self.finished == len(self.futures):
+                self._all_done.set()
+
+    def progress(self) -> Tuple[int, int]:
+        """Return (finished maps, total maps); a map counts once on_render has returned."""
+        return self.finished, len(self.futures)
+
+    def done(self) -> bool:
+        """Whether every map has finished."""
+        finished, total = self.progress()
+        return finished == total
+
+    def errors(self) -> Dict[str, BaseException]:
+        """Exceptions of the maps that could not be rendered, by page:municipality."""
+        return dict(self.failed)
+
+    def wait(self):
+        """Block until every map has finished."""
+        self._all_done.wait()
+
+
+class WarmJob:
+    """
+    Runs the warm command (main() below) in a child process and follows its progress.
+
+    The app cannot start the render pool itself: Streamlit installs the page script as
+    __main__, which spawned workers would run again. Each map the child stores is loaded
+    into `cache` as it is reported, so the pages find it without going to storage.
+    """
+
+    def __init__(self, workers: int, cache: MemoryCache, version: str = DATA_VERSION):
+        self.cache = cache
+        self.version = version
+        self.finished = 0
+        self.total: Optional[int] = None
+        self.failed: Dict[str, str] = {}
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "src.warm", "--workers", str(workers), "--jsonl"],
+            cwd=REPO_ROOT, stdout=subprocess.PIPE, text=True, encoding="utf-8"
+        )
+        threading.Thread(target=self._follow, name=f"{THREAD_PREFIX}-warm", daemon=True).start()
+
+    def _follow(self):
+        for line in self.process.stdout:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            self.total = record["total"]
+            self.finished += 1
+            page, municipality = record["page"], record["municipality"]
+            if "error" in record:
+                self.failed[f"{page}:{municipality}"] = record["error"]
+                continue
+            key = map_key(page, municipality, map_settings(page), self.version)
+            stored = load_stored_map(key)
+            if stored is not None:
+                self.cache.put(key, stored, self.version)
+        if self.process.wait() != 0:
+            self.failed["warm"] = f"exited with status {self.process.returncode}"
+        self.total = self.finished
+
+    def progress(self) -> Tuple[int, int]:
+        """Return (finished maps, total maps); the total is unknown (1) until the first map is reported."""
+        return self.finished, self.total if self.total is not None else self.finished + 1
+
+    def done(self) -> bool:
+        finished, total = self.progress()
+        return finished == total
+
+    def errors(self) -> Dict[str, str]:
+        """Maps that could not be rendered, by page:municipality."""
+        return dict(self.failed)
+
+
+class AppWarmer:
+    """The start-up warm-up: slices and aggregates on a thread pool, maps in a WarmJob."""
+
+    def __init__(self, slices: Prefetcher, maps: Optional[WarmJob]):
+        self.slices = slices
+        self.maps = maps
+
+    def progress(self) -> Tuple[int, int]:
+        """Return (finished tasks, total tasks) over slices and maps."""
+        finished, total = self.slices.progress()
+        if self.maps is not None:
+            maps_finished, maps_total = self.maps.progress()
+            finished, total = finished + maps_finished, total + maps_total
+        return finished, total
+
+    def done(self) -> bool:
+        """Whether every task has finished."""
+        finished, total = self.progress()
+        return finished == total
+
+
+@st.cache_resource
+def start_warmer(version: str = DATA_VERSION) -> AppWarmer:
+    """
+    Start warming every page for every municipality in the background, once per process and
+    dataset version. Off unless DASHBOARD_WARM=1; DASHBOARD_WARM_WORKERS sets the render processes.
+    """
+    if os.environ.get("DASHBOARD_WARM", "0") != "1":
+        return AppWarmer(Prefetcher({}), None)
+    slices = Prefetcher(slice_tasks(all_municipalities(version), version))
+    maps = WarmJob(int(os.environ.get("DASHBOARD_WARM_WORKERS", "2")), get_render_cache(), version)
+    return AppWarmer(slices, maps)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=f"Render and store every page's map for {DATA_VERSION}.")
+    parser.add_argument("--pages", nargs="+", default=list(PAGE_MAPS), help=f"Pages to render (default: {' '.join(PAGE_MAPS)})")
+    parser.add_argument("--municipalities", nargs="+", help="Municipalities to render (default: all)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Processes rendering maps")
+    parser.add_argument("--jsonl", action="store_true", help="Report progress as one JSON line per map (used by the app)")
+    args = parser.parse_args()
+    unknown = set(args.pages) - set(PAGE_MAPS)
+    if unknown:
+        parser.error(f"unknown pages: {', '.join(sorted(unknown))}")
+    if load_partition_manifest() is None and not args.jsonl:
+        print("no build found: maps are rendered from the source layers; run python -m src.build first to store them with it")
+    municipalities = args.municipalities or all_municipalities()
+
+    start = time.perf_counter()
+    total = len(args.pages) * len(municipalities)
+    done = []
+
+    def store(page: str, municipality: str, rendered: RenderedMap):
+        store_map(map_key(page, municipality, map_settings(page)), rendered)
+        done.append(rendered.size)
+        if args.jsonl:
+            print(json.dumps({"page": page, "municipality": municipality, "total": total}, ensure_ascii=False), flush=True)
+        else:
+            print(f"[{len(done)}/{total}] {page} {municipality}: {rendered.size / 1024:.0f} KiB, {time.perf_counter() - start:.1f}s")
+
+    warmer = Warmer(args.pages, municipalities, store, args.workers)
+    warmer.wait()
+    for name, error in warmer.errors().items():
+        page, municipality = name.split(":", 1)
+        if args.jsonl:
+            print(json.dumps({"page": page, "municipality": municipality, "total": total, "error": repr(error)}, ensure_ascii=False))
+        else:
+            print(f"{name}: failed: {error!r}")
+    if args.jsonl:
+        return
+    print(
+        f"{len(done)} maps stored ({sum(done) / 2**20:.0f} MiB), {len(warmer.errors())} failed, "
+        f"{time.perf_counter() - start:.1f}s"
+    )
+
+
+if __name__ == "__main__":
+    main()